@@ -5,29 +5,87 @@ Claude Code -> proxy -> ollama:11434
 """
 
 import json
+import http.client
 import http.server
 import urllib.request
 import urllib.error
 import urllib.parse
 import sys
 import time
-import uuid
+import secrets
 import threading
+import queue
+import atexit
 import os
 import datetime
 import re
 import traceback
 import shutil
+import io
+import functools
+
+# orjson is optional: much faster on the SSE hot path, stdlib json otherwise
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 # Force unbuffered stdout so print() appears immediately in log files
 if hasattr(sys.stdout, 'buffer'):
-    import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, write_through=True, line_buffering=True)
 
 print("[proxy] === PROXY MODULE LOADED (with WebSearch interception) ===", file=sys.stderr)
 
+
+def _dumps(data, indent=False):
+    """Serialize data to UTF-8 JSON bytes (non-ASCII kept as-is)."""
+    if HAS_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    return json.dumps(data, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+
+# Both raise json.JSONDecodeError (orjson's error subclasses it)
+_loads = orjson.loads if HAS_ORJSON else json.loads
+
+
+def _read_exact(fp, length):
+    """Read up to length bytes from fp into one preallocated bytearray
+    (no intermediate bytes object). Shorter if fp hits EOF first."""
+    buf = bytearray(length)
+    view = memoryview(buf)
+    got = 0
+    while got < length:
+        n = fp.readinto(view[got:])
+        if not n:
+            break
+        got += n
+    view.release()
+    if got < length:
+        del buf[got:]
+    return buf
+
+
+def _read_json(resp):
+    """Parse an HTTP response body as JSON.
+    When Content-Length is known the body is read straight into one
+    preallocated buffer instead of an intermediate bytes object."""
+    try:
+        length = int(resp.headers.get("Content-Length") or 0)
+    except ValueError:
+        length = 0
+    if length <= 0:
+        return _loads(resp.read())
+    return _loads(_read_exact(resp, length))
+
+
 OLLAMA_BASE = os.environ.get("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
 PROXY_PORT = int(os.environ.get("VIBE_LOCAL_PROXY_PORT", "8082"))
+# Worker threads serving requests (bounds concurrent Ollama calls)
+PROXY_WORKERS = max(1, int(os.environ.get("VIBE_LOCAL_PROXY_WORKERS", "8")))
 
 # [SEC] Validate OLLAMA_HOST to prevent SSRF - only allow localhost targets
 def _validate_ollama_host(url):
@@ -44,6 +102,109 @@ def _validate_ollama_host(url):
 
 OLLAMA_BASE = _validate_ollama_host(OLLAMA_BASE)
 
+
+# --- Keep-alive connection pool to Ollama ---
+# urlopen() opens (and closes) a new TCP connection per call. The pool keeps
+# idle HTTP/1.1 connections around and reuses them (stdlib http.client only).
+
+class _PooledResponse(http.client.HTTPResponse):
+    """HTTPResponse that hands its connection back to the pool on close()."""
+    _on_close = None
+
+    def close(self):
+        # Reusable only if the body was fully read and the server keeps alive
+        reusable = self.fp is None and not self.will_close
+        super().close()
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close(reusable)
+
+
+class _OllamaPool:
+    """Pool of keep-alive connections to OLLAMA_BASE.
+    urlopen() mirrors urllib: connection failures raise URLError and
+    HTTP error statuses raise HTTPError."""
+
+    def __init__(self, base_url, maxsize):
+        parsed = urllib.parse.urlparse(base_url)
+        if parsed.scheme == "https":
+            self._conn_cls = http.client.HTTPSConnection
+        else:
+            self._conn_cls = http.client.HTTPConnection
+        self._base_url = base_url
+        self._scheme = parsed.scheme
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self._prefix = parsed.path.rstrip("/")
+        self._idle = queue.LifoQueue(maxsize)
+
+    def _use_urllib(self):
+        """True if HTTP(S)_PROXY applies to Ollama (not bypassed by no_proxy).
+        Pooled connections talk to the host directly, so such requests go
+        through urllib.request.urlopen, which honors the proxy."""
+        return (self._scheme in urllib.request.getproxies()
+                and not urllib.request.proxy_bypass(self._host or ""))
+
+    def _get(self, timeout):
+        """Return (connection, reused)."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._conn_cls(self._host, self._port, timeout=timeout)
+            conn.response_class = _PooledResponse
+            return conn, False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _release(self, conn, reusable):
+        if reusable:
+            try:
+                self._idle.put_nowait(conn)
+                return
+            except queue.Full:
+                pass
+        conn.close()
+
+    def urlopen(self, path, data=None, timeout=300):
+        """POST JSON bytes to path (GET when data is None). Use as a context
+        manager or close() the response to return the connection."""
+        method = "GET" if data is None else "POST"
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        if self._use_urllib():
+            req = urllib.request.Request(self._base_url + path, data=data,
+                                         headers=headers, method=method)
+            return urllib.request.urlopen(req, timeout=timeout)
+        while True:
+            conn, reused = self._get(timeout)
+            try:
+                conn.request(method, self._prefix + path, body=data, headers=headers)
+                resp = conn.getresponse()
+                break
+            except (ConnectionResetError, BrokenPipeError) as e:
+                # RemoteDisconnected included: an idle socket the server has
+                # since closed. Retry on another (eventually fresh) connection.
+                conn.close()
+                if not reused:
+                    raise urllib.error.URLError(e)
+            except OSError as e:
+                conn.close()
+                raise urllib.error.URLError(e)
+            except Exception:
+                conn.close()
+                raise
+        resp._on_close = functools.partial(self._release, conn)
+        if resp.status >= 400:
+            body = resp.read()
+            resp.close()
+            raise urllib.error.HTTPError(self._base_url + path, resp.status, resp.reason,
+                                         resp.headers, io.BytesIO(body))
+        return resp
+
+
+_OLLAMA_POOL = _OllamaPool(OLLAMA_BASE, maxsize=PROXY_WORKERS)
+
 # --- Model routing ---
 # Map Claude model patterns to local Ollama models
 # Main model: for full coding tasks (tool use, long context)
@@ -86,6 +247,8 @@ os.makedirs(LOG_DIR, mode=0o700, exist_ok=True)
 
 # --- Debug mode ---
 DEBUG_MODE = os.environ.get("VIBE_LOCAL_DEBUG", "0") == "1"
+# Metadata logs are on by default; VIBE_LOCAL_PROXY_LOG=0 turns them off
+LOG_ENABLED = DEBUG_MODE or os.environ.get("VIBE_LOCAL_PROXY_LOG", "1") != "0"
 
 # --- Session directory (created per proxy launch) ---
 _session_ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -161,6 +324,15 @@ Speed test: Bash(curl -o /dev/null -s -w '%{speed_download}' 'https://speed.clou
 """
 
 
+# (line marker, env_info key), checked in order per line
+_ENV_FIELDS = (
+    ("working directory:", "cwd"),
+    ("platform:", "platform"),
+    ("shell:", "shell"),
+    ("os version:", "os_version"),
+)
+
+
 def _extract_environment_info(sys_text):
     """Extract # Environment section from Claude Code's system prompt."""
     env_info = {}
@@ -168,30 +340,44 @@ def _extract_environment_info(sys_text):
     env_start = sys_text.find("# Environment")
     if env_start < 0:
         return env_info
-    env_block = sys_text[env_start:]
-    # Extract key fields
-    for line in env_block.split("\n"):
+    # Extract key fields. The first value wins and the scan stops once all
+    # are found: text after the section can be long (e.g. git status).
+    for line in sys_text[env_start:].splitlines():
         line = line.strip().lstrip("- ")
-        if "working directory:" in line.lower():
-            env_info["cwd"] = line.split(":", 1)[1].strip()
-        elif "platform:" in line.lower():
-            env_info["platform"] = line.split(":", 1)[1].strip()
-        elif "shell:" in line.lower():
-            env_info["shell"] = line.split(":", 1)[1].strip()
-        elif "os version:" in line.lower():
-            env_info["os_version"] = line.split(":", 1)[1].strip()
+        lower = line.lower()
+        for marker, key in _ENV_FIELDS:
+            if marker in lower:
+                if key not in env_info:
+                    env_info[key] = line.split(":", 1)[1].strip()
+                break
+        if len(env_info) == len(_ENV_FIELDS):
+            break
     return env_info
 
 # Essential tools only - drop tools that confuse local models
 # (Task, TaskOutput, AskUserQuestion, EnterPlanMode, ExitPlanMode etc.)
-ALLOWED_TOOLS = {
+ALLOWED_TOOLS = frozenset({
     "Bash", "Read", "Write", "Edit", "Glob", "Grep",
     "WebFetch", "WebSearch", "NotebookEdit",
-}
+})
 # Set to None to disable tool filtering
 # ALLOWED_TOOLS = None
 
 
+@functools.lru_cache(maxsize=16)
+def _fc_hint(tool_names):
+    """Function-calling reminder appended to the system prompt.
+    Cached per tool-name tuple (the tool list rarely changes in a session)."""
+    return (
+        "\n\n[IMPORTANT: FUNCTION CALLING]\n"
+        "You have tools available via function calling: " + ", ".join(tool_names) + ".\n"
+        "When you need to perform any action, you MUST use function calls.\n"
+        "Do NOT write commands as plain text. Do NOT output XML tags.\n"
+        "Use the function calling mechanism provided by the API.\n"
+        "Always prefer Bash tool for system commands. Do NOT use Task or AskUserQuestion.\n"
+    )
+
+
 def _open_private(path, mode="w"):
     """Open a file with restricted permissions (owner-only on Unix)."""
     if os.name != "nt":
@@ -200,36 +386,75 @@ def _open_private(path, mode="w"):
     return open(path, mode)
 
 
-def _log(tag, data, req_id=None):
-    """Write metadata log (always active). Uses session directory with optional req_id prefix."""
-    ts = datetime.datetime.now().strftime("%H%M%S")
-    prefix = f"{req_id:04d}_{ts}" if req_id else ts
-    path = os.path.join(SESSION_DIR, f"{prefix}_{tag}.json")
+# --- Background log writer ---
+# Log files are written by one daemon thread so request threads never wait
+# on disk I/O. Entries are dropped (not blocked on) when the queue is full.
+_log_queue = queue.Queue(maxsize=1024)
+_log_writer = None
+_log_writer_lock = threading.Lock()
+
+
+def _write_log_entry(path, tag, data, announce):
     try:
-        with _open_private(path) as f:
+        with _open_private(path, "wb") as f:
             if isinstance(data, (dict, list)):
-                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.write(_dumps(data, indent=True))
             else:
-                f.write(str(data))
-        print(f"[proxy][log] {tag} -> {os.path.basename(path)}")
+                f.write(str(data).encode("utf-8"))
+        if announce:
+            print(f"[proxy][log] {tag} -> {os.path.basename(path)}")
     except Exception as e:
-        print(f"[proxy][log] ERROR writing {tag}: {e}")
+        print(f"[proxy][log] ERROR writing {tag}: {e}", file=sys.stderr)
+
+
+def _log_worker():
+    while True:
+        _write_log_entry(*_log_queue.get())
+
+
+def _drain_log_queue():
+    """Write out entries still queued at exit (the writer is a daemon)."""
+    while True:
+        try:
+            entry = _log_queue.get_nowait()
+        except queue.Empty:
+            return
+        _write_log_entry(*entry)
+
+
+atexit.register(_drain_log_queue)
+
+
+def _enqueue_log(path, tag, data, announce):
+    global _log_writer
+    if _log_writer is None:
+        with _log_writer_lock:
+            if _log_writer is None:
+                _log_writer = threading.Thread(target=_log_worker, name="proxy-log", daemon=True)
+                _log_writer.start()
+    try:
+        _log_queue.put_nowait((path, tag, data, announce))
+    except queue.Full:
+        pass
+
+
+def _log(tag, data, req_id=None):
+    """Queue metadata log (unless VIBE_LOCAL_PROXY_LOG=0). Uses session directory with optional req_id prefix."""
+    if not LOG_ENABLED:
+        return
+    ts = datetime.datetime.now().strftime("%H%M%S")
+    prefix = f"{req_id:04d}_{ts}" if req_id else ts
+    path = os.path.join(SESSION_DIR, f"{prefix}_{tag}.json")
+    _enqueue_log(path, tag, data, True)
 
 
 def _debug_log(req_id, tag, data):
-    """Write full content log (DEBUG_MODE only)."""
+    """Queue full content log (DEBUG_MODE only)."""
     if not DEBUG_MODE:
         return
     ts = datetime.datetime.now().strftime("%H%M%S")
     path = os.path.join(SESSION_DIR, f"{req_id:04d}_{ts}_{tag}.json")
-    try:
-        with _open_private(path) as f:
-            if isinstance(data, (dict, list)):
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            else:
-                f.write(str(data))
-    except Exception as e:
-        print(f"[proxy][debug] ERROR writing {tag}: {e}", file=sys.stderr)
+    _enqueue_log(path, tag, data, False)
 
 
 def _debug_summary(req_id, model, msg_count, mode, elapsed_ms, ok, stop_reason=None, tools=None):
@@ -254,8 +479,8 @@ def _save_replay(req_id, req, proxy_port):
     body_filename = f"{req_id:04d}_{ts}_replay_body.json"
     body_path = os.path.join(SESSION_DIR, body_filename)
     try:
-        with _open_private(body_path) as f:
-            json.dump(req, f, ensure_ascii=False, indent=2)
+        with _open_private(body_path, "wb") as f:
+            f.write(_dumps(req, indent=True))
     except Exception:
         return
 
@@ -363,108 +588,214 @@ def _ddg_search(query, max_results=8):
     return results
 
 
+# Tool-call XML patterns (compiled once; used on every non-streaming response)
+_INVOKE_PAT = re.compile(r'<invoke\s+name=\"([^\"]+)\">(.*?)</invoke>', re.DOTALL)
+_PARAM_PAT = re.compile(r'<parameter\s+name=\"([^\"]+)\">(.*?)</parameter>', re.DOTALL)
+_QWEN_FUNC_PAT = re.compile(r'<function=([^>]+)>(.*?)</function>', re.DOTALL)
+_QWEN_PARAM_PAT = re.compile(r'<parameter=([^>]+)>(.*?)</parameter>', re.DOTALL)
+_INNER_PARAM_PAT = re.compile(r"<([a-zA-Z_]\w*)>(.*?)</\1>", re.DOTALL)
+_FC_WRAPPER_PAT = re.compile(r"</?(?:function_calls|action)[^>]*>")
+_TOOL_CALL_WRAPPER_PAT = re.compile(r"</?tool_call>")
+
+
+@functools.lru_cache(maxsize=32)
+def _simple_tool_pat(known_tools):
+    """Pattern 3 regex for a tuple of tool names (cached per tool set)."""
+    names_re = "|".join(re.escape(t) for t in known_tools)
+    return re.compile(r"<(%s)>(.*?)</\1>" % names_re, re.DOTALL)
+
+
+def _xml_tool_call(tool_name, params):
+    """Build an OpenAI-style tool call entry for an XML-extracted call."""
+    return {
+        "id": f"call_{secrets.token_hex(4)}",
+        "type": "function",
+        "function": {
+            "name": tool_name,
+            "arguments": _dumps(params).decode("utf-8"),
+        },
+    }
+
+
 def _extract_tool_calls_from_text(text, known_tools=None):
     """Parse XML-style tool calls from text content.
-    Returns (tool_calls_list, cleaned_text)."""
+    Returns (tool_calls_list, cleaned_text).
+    Each pattern extracts and strips its matches in a single re.sub pass."""
     tool_calls = []
-    remaining_text = text
 
     # Pattern 1: <invoke name="ToolName"><parameter name="p">v</parameter></invoke>
-    invoke_pat = re.compile(
-        r'<invoke\s+name=\"([^\"]+)\">(.*?)</invoke>',
-        re.DOTALL
-    )
-    param_pat = re.compile(
-        r'<parameter\s+name=\"([^\"]+)\">(.*?)</parameter>',
-        re.DOTALL
-    )
-
-    for m in invoke_pat.finditer(text):
-        tool_name = m.group(1)
-        params_text = m.group(2)
+    def _invoke_sub(m):
         params = {}
-        for pm in param_pat.finditer(params_text):
+        for pm in _PARAM_PAT.finditer(m.group(2)):
             params[pm.group(1)] = pm.group(2).strip()
-        tool_calls.append({
-            "id": f"call_{uuid.uuid4().hex[:8]}",
-            "type": "function",
-            "function": {
-                "name": tool_name,
-                "arguments": json.dumps(params, ensure_ascii=False),
-            },
-        })
-        remaining_text = remaining_text.replace(m.group(0), "")
+        tool_calls.append(_xml_tool_call(m.group(1), params))
+        return ""
 
     # Clean wrapper tags
-    for tag in ["function_calls", "action"]:
-        remaining_text = re.sub(r"</?%s[^>]*>" % re.escape(tag), "", remaining_text)
+    remaining_text = _FC_WRAPPER_PAT.sub("", _INVOKE_PAT.sub(_invoke_sub, text))
 
     if tool_calls:
         return tool_calls, remaining_text.strip()
 
     # Pattern 2: Qwen format: <function=ToolName><parameter=param>value</parameter></function>
-    qwen_func_pat = re.compile(
-        r'<function=([^>]+)>(.*?)</function>',
-        re.DOTALL
-    )
-    qwen_param_pat = re.compile(
-        r'<parameter=([^>]+)>(.*?)</parameter>',
-        re.DOTALL
-    )
-    for m in qwen_func_pat.finditer(text):
-        tool_name = m.group(1).strip()
-        params_text = m.group(2)
+    def _qwen_sub(m):
         params = {}
-        for pm in qwen_param_pat.finditer(params_text):
+        for pm in _QWEN_PARAM_PAT.finditer(m.group(2)):
             params[pm.group(1).strip()] = pm.group(2).strip()
-        if params:
-            tool_calls.append({
-                "id": f"call_{uuid.uuid4().hex[:8]}",
-                "type": "function",
-                "function": {
-                    "name": tool_name,
-                    "arguments": json.dumps(params, ensure_ascii=False),
-                },
-            })
-            remaining_text = remaining_text.replace(m.group(0), "")
+        if not params:
+            return m.group(0)
+        tool_calls.append(_xml_tool_call(m.group(1).strip(), params))
+        return ""
 
+    remaining_text = _FC_WRAPPER_PAT.sub("", _QWEN_FUNC_PAT.sub(_qwen_sub, text))
     # Clean Qwen wrapper tags
-    remaining_text = re.sub(r'</tool_call>', '', remaining_text)
-    remaining_text = re.sub(r'<tool_call>', '', remaining_text)
+    remaining_text = _TOOL_CALL_WRAPPER_PAT.sub("", remaining_text)
 
     if tool_calls:
         return tool_calls, remaining_text.strip()
 
     # Pattern 3: <ToolName><param>val</param></ToolName>
     if known_tools:
-        names_re = "|".join(re.escape(t) for t in known_tools)
-        simple_pat = re.compile(r"<(%s)>(.*?)</\1>" % names_re, re.DOTALL)
-        inner_pat = re.compile(r"<([a-zA-Z_]\w*)>(.*?)</\1>", re.DOTALL)
-        for m in simple_pat.finditer(text):
-            tool_name = m.group(1)
-            inner = m.group(2)
+        def _simple_sub(m):
             params = {}
-            for pm in inner_pat.finditer(inner):
+            for pm in _INNER_PARAM_PAT.finditer(m.group(2)):
                 params[pm.group(1)] = pm.group(2).strip()
-            if params:
-                tool_calls.append({
-                    "id": f"call_{uuid.uuid4().hex[:8]}",
-                    "type": "function",
-                    "function": {
-                        "name": tool_name,
-                        "arguments": json.dumps(params, ensure_ascii=False),
-                    },
-                })
-                remaining_text = remaining_text.replace(m.group(0), "")
-        for tag in ["action", "function_calls"]:
-            remaining_text = re.sub(r"</?%s[^>]*>" % tag, "", remaining_text)
+            if not params:
+                return m.group(0)
+            tool_calls.append(_xml_tool_call(m.group(1), params))
+            return ""
+
+        remaining_text = _simple_tool_pat(tuple(known_tools)).sub(_simple_sub, text)
+        remaining_text = _TOOL_CALL_WRAPPER_PAT.sub("", _FC_WRAPPER_PAT.sub("", remaining_text))
 
     return tool_calls, remaining_text.strip()
 
+# --- Anthropic content block -> OpenAI message parts ---
+# Each converter appends to (text_parts, tool_calls_out, tool_results).
+# Block types without a converter (e.g. "thinking") are dropped.
+
+def _convert_text_block(block, text_parts, tool_calls_out, tool_results):
+    text_parts.append(block.get("text", ""))
+
+
+def _convert_image_block(block, text_parts, tool_calls_out, tool_results):
+    # A6: Convert Anthropic image format to OpenAI image_url data URI
+    source = block.get("source", {})
+    src_type = source.get("type", "")
+    if src_type == "base64":
+        media_type = source.get("media_type", "image/png")
+        data = source.get("data", "")
+        if data:
+            text_parts.append({
+                "type": "image_url",
+                "image_url": {"url": f"data:{media_type};base64,{data}"},
+            })
+    elif src_type == "url":
+        url = source.get("url", "")
+        if url:
+            text_parts.append({
+                "type": "image_url",
+                "image_url": {"url": url},
+            })
+
+
+def _convert_tool_use_block(block, text_parts, tool_calls_out, tool_results):
+    tool_calls_out.append({
+        "id": block["id"] if "id" in block else f"call_{secrets.token_hex(4)}",
+        "type": "function",
+        "function": {
+            "name": block.get("name", ""),
+            "arguments": _dumps(block.get("input", {})).decode("utf-8"),
+        },
+    })
+
+
+def _convert_tool_result_block(block, text_parts, tool_calls_out, tool_results):
+    result_content = block.get("content", "")
+    if isinstance(result_content, list):
+        result_content = "\n".join(
+            b.get("text", str(b)) for b in result_content
+            if isinstance(b, dict)
+        )
+    tool_results.append({
+        "role": "tool",
+        "tool_call_id": block.get("tool_use_id", ""),
+        "content": str(result_content),
+    })
+
+
+_BLOCK_CONVERTERS = {
+    "text": _convert_text_block,
+    "image": _convert_image_block,
+    "tool_use": _convert_tool_use_block,
+    "tool_result": _convert_tool_result_block,
+}
+
+
+def _iter_count_texts(req):
+    """Yield the text pieces of a count_tokens request (messages, then system)."""
+    for msg in req.get("messages", []):
+        content = msg.get("content", "")
+        if isinstance(content, list):
+            for block in content:
+                if isinstance(block, dict) and block.get("type") == "text":
+                    yield block.get("text", "")
+        else:
+            yield str(content)
+    system = req.get("system", "")
+    if system:
+        if isinstance(system, list):
+            for block in system:
+                if isinstance(block, dict):
+                    yield block.get("text", "")
+        else:
+            yield str(system)
+
+
+# Plain text stream chunks are the common case: take delta.content straight
+# from the raw line instead of parsing the whole chunk. Chunks carrying
+# reasoning or tool calls (or no string content) go through the full parse.
+_STREAM_CONTENT_PAT = re.compile(rb'"content"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def _fast_stream_text(data):
+    """Return delta.content of a text-only stream chunk, or None when the
+    chunk needs a full JSON parse."""
+    if b'"reasoning"' in data or b'"tool_calls"' in data:
+        return None
+    m = _STREAM_CONTENT_PAT.search(data)
+    if m is None:
+        return None
+    raw = m.group(1)
+    if b"\\" not in raw:
+        return raw.decode("utf-8", errors="replace")
+    # Escapes present: let the JSON parser decode just the string literal
+    return _loads(b'"' + raw + b'"')
+
+
+# OpenAI finish_reason -> Anthropic stop_reason (others pass through)
+_STOP_REASONS = {"tool_calls": "tool_use", "stop": "end_turn"}
+
+# Pre-encoded SSE frame pieces: only the JSON payload is built per frame
+_SSE_PREFIX = {
+    name: f"event: {name}\ndata: ".encode("ascii")
+    for name in (
+        "message_start", "content_block_start", "content_block_delta",
+        "content_block_stop", "message_delta", "message_stop",
+    )
+}
+_SSE_SUFFIX = b"\n\n"
+
+
 class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
     # NOTE: _current_tool_names is set per-request in _handle_messages()
     # to avoid thread-safety issues with concurrent requests
 
+    def setup(self):
+        super().setup()
+        # Pending SSE frames, coalesced per upstream chunk (see _sse_flush)
+        self._sse_buf = bytearray()
+
     def log_message(self, format, *args):
         print(f"[proxy] {args[0]}" if args else "")
 
@@ -478,8 +809,8 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
             self._respond(200, {"status": "ok", "proxy": "anthropic-to-ollama"})
         elif path == "/v1/models":
             try:
-                resp = urllib.request.urlopen(f"{OLLAMA_BASE}/v1/models", timeout=5)
-                data = json.loads(resp.read())
+                with _OLLAMA_POOL.urlopen("/v1/models", timeout=5) as resp:
+                    data = _read_json(resp)
                 self._respond(200, data)
             except Exception as e:
                 # [SEC] Log full error internally, return generic message
@@ -503,9 +834,9 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
         if content_length > self.MAX_REQUEST_BYTES:
             self._respond(413, {"error": f"request too large: {content_length} bytes (max {self.MAX_REQUEST_BYTES})"})
             return
-        body = self.rfile.read(content_length)
+        body = _read_exact(self.rfile, content_length)
         try:
-            req = json.loads(body) if body else {}
+            req = _loads(body) if body else {}
         except json.JSONDecodeError:
             self._respond(400, {"error": "invalid JSON"})
             return
@@ -552,7 +883,8 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
             results = _ddg_search(query)
         except Exception as e:
             print(f"[proxy][websearch] DDG search exception: {e}", file=sys.stderr)
-            traceback.print_exc()
+            if DEBUG_MODE:
+                traceback.print_exc()
             results = None
 
         result_count = len(results) if results else 0
@@ -564,9 +896,9 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
             "elapsed_ms": elapsed_ms,
         }, req_id=req_id)
 
-        msg_id = f"msg_{uuid.uuid4().hex[:24]}"
+        msg_id = f"msg_{secrets.token_hex(12)}"
         model = req.get("model", "claude-haiku-4-5-20251001")
-        srvtool_id = f"srvtoolu_{uuid.uuid4().hex[:24]}"
+        srvtool_id = f"srvtoolu_{secrets.token_hex(12)}"
 
         self.send_response(200)
         self.send_header("Content-Type", "text/event-stream")
@@ -638,7 +970,7 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
             "usage": {"output_tokens": result_count * 20},
         })
         self._send_sse("message_stop", {"type": "message_stop"})
-        self.wfile.flush()
+        self._sse_flush()
 
         print(f"[proxy][websearch] Done in {elapsed_ms}ms, {result_count} results (web_search_tool_result format)", file=sys.stderr)
 
@@ -673,7 +1005,7 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
             _log("init_probe", {"req_id": req_id}, req_id=req_id)
             stream = req.get("stream", False)
             probe_model = req.get("model", "qwen3-coder:30b")
-            msg_id = f"msg_{uuid.uuid4().hex[:24]}"
+            msg_id = f"msg_{secrets.token_hex(12)}"
             if stream:
                 self.send_response(200)
                 self.send_header("Content-Type", "text/event-stream")
@@ -704,7 +1036,7 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
                     "usage": {"output_tokens": 0},
                 })
                 self._send_sse("message_stop", {"type": "message_stop"})
-                self.wfile.flush()
+                self._sse_flush()
             else:
                 self._respond(200, {
                     "id": msg_id, "type": "message", "role": "assistant",
@@ -858,16 +1190,7 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
                 print(f"[proxy] System prompt replaced: {original_sys_len} -> {len(sys_text)} chars (env: {bool(env_info)})")
 
             if has_tools:
-                tool_names_str = ", ".join(current_tool_names[:15])
-                fc_hint = (
-                    "\n\n[IMPORTANT: FUNCTION CALLING]\n"
-                    "You have tools available via function calling: " + tool_names_str + ".\n"
-                    "When you need to perform any action, you MUST use function calls.\n"
-                    "Do NOT write commands as plain text. Do NOT output XML tags.\n"
-                    "Use the function calling mechanism provided by the API.\n"
-                    "Always prefer Bash tool for system commands. Do NOT use Task or AskUserQuestion.\n"
-                )
-                sys_text += fc_hint
+                sys_text += _fc_hint(tuple(current_tool_names[:15]))
 
             oai_messages.append({"role": "system", "content": sys_text})
 
@@ -882,57 +1205,14 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
 
                 for block in content:
                     if isinstance(block, dict):
-                        btype = block.get("type", "")
-                        if btype == "text":
-                            text_parts.append(block.get("text", ""))
-                        elif btype == "image":
-                            # A6: Convert Anthropic image format to OpenAI image_url data URI
-                            source = block.get("source", {})
-                            src_type = source.get("type", "")
-                            if src_type == "base64":
-                                media_type = source.get("media_type", "image/png")
-                                data = source.get("data", "")
-                                if data:
-                                    text_parts.append({
-                                        "type": "image_url",
-                                        "image_url": {"url": f"data:{media_type};base64,{data}"},
-                                    })
-                            elif src_type == "url":
-                                url = source.get("url", "")
-                                if url:
-                                    text_parts.append({
-                                        "type": "image_url",
-                                        "image_url": {"url": url},
-                                    })
-                        elif btype == "thinking":
-                            pass
-                        elif btype == "tool_use":
-                            tool_calls_out.append({
-                                "id": block.get("id", f"call_{uuid.uuid4().hex[:8]}"),
-                                "type": "function",
-                                "function": {
-                                    "name": block.get("name", ""),
-                                    "arguments": json.dumps(block.get("input", {}), ensure_ascii=False),
-                                },
-                            })
-                        elif btype == "tool_result":
-                            result_content = block.get("content", "")
-                            if isinstance(result_content, list):
-                                result_content = "\n".join(
-                                    b.get("text", str(b)) for b in result_content
-                                    if isinstance(b, dict)
-                                )
-                            tool_results.append({
-                                "role": "tool",
-                                "tool_call_id": block.get("tool_use_id", ""),
-                                "content": str(result_content),
-                            })
+                        convert = _BLOCK_CONVERTERS.get(block.get("type", ""))
+                        if convert is not None:
+                            convert(block, text_parts, tool_calls_out, tool_results)
                     else:
                         text_parts.append(str(block))
 
                 if tool_results:
-                    for tr in tool_results:
-                        oai_messages.append(tr)
+                    oai_messages.extend(tool_results)
                     continue
 
                 if tool_calls_out:
@@ -1023,20 +1303,14 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
         timeout = SIDECAR_TIMEOUT if is_sidecar else 300
 
         try:
-            oai_body = json.dumps(oai_req).encode("utf-8")
-            oai_request = urllib.request.Request(
-                f"{OLLAMA_BASE}/v1/chat/completions",
-                data=oai_body,
-                headers={"Content-Type": "application/json"},
-                method="POST",
-            )
+            oai_body = _dumps(oai_req)
 
             if stream:
-                self._handle_stream(oai_request, model, req_id=req_id, t_start=t_start, msg_count=len(messages), timeout=timeout)
+                self._handle_stream(oai_body, model, req_id=req_id, t_start=t_start, msg_count=len(messages), timeout=timeout)
             elif original_stream:
-                self._handle_sync_as_sse(oai_request, model, req_id=req_id, t_start=t_start, msg_count=len(messages), timeout=timeout, tool_names=current_tool_names)
+                self._handle_sync_as_sse(oai_body, model, req_id=req_id, t_start=t_start, msg_count=len(messages), timeout=timeout, tool_names=current_tool_names)
             else:
-                self._handle_sync(oai_request, model, req_id=req_id, t_start=t_start, msg_count=len(messages), timeout=timeout, tool_names=current_tool_names)
+                self._handle_sync(oai_body, model, req_id=req_id, t_start=t_start, msg_count=len(messages), timeout=timeout, tool_names=current_tool_names)
 
         except urllib.error.URLError as e:
             elapsed_ms = int((time.time() - t_start) * 1000)
@@ -1050,7 +1324,11 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
         except Exception as e:
             elapsed_ms = int((time.time() - t_start) * 1000)
             _debug_summary(req_id, model, len(messages), "sync", elapsed_ms, False)
-            traceback.print_exc()
+            # Full stack only in debug mode; a one-liner keeps error storms cheap
+            if DEBUG_MODE:
+                traceback.print_exc()
+            else:
+                print(f"[proxy] error: {type(e).__name__}: {e}", file=sys.stderr)
             # [SEC] Don't leak internal error details to client
             self._respond(500, {
                 "type": "error",
@@ -1094,9 +1372,9 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
 
         return content_text, reasoning_text, tool_calls, finish_reason
 
-    def _handle_sync(self, oai_request, model, req_id=0, t_start=None, msg_count=0, timeout=300, tool_names=None):
-        resp = urllib.request.urlopen(oai_request, timeout=timeout)
-        oai_resp = json.loads(resp.read())
+    def _handle_sync(self, oai_body, model, req_id=0, t_start=None, msg_count=0, timeout=300, tool_names=None):
+        with _OLLAMA_POOL.urlopen("/v1/chat/completions", oai_body, timeout=timeout) as resp:
+            oai_resp = _read_json(resp)
         # [H3 fix] Log metadata only, not full response content
         _log("resp_from_ollama_sync_meta", {
             "model": oai_resp.get("model"),
@@ -1119,11 +1397,11 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
             for tc in tool_calls:
                 func = tc.get("function", {})
                 try:
-                    tool_input = json.loads(func.get("arguments", "{}"))
+                    tool_input = _loads(func.get("arguments", "{}"))
                 except json.JSONDecodeError:
                     tool_input = {"raw": func.get("arguments", "")}
                 raw_id = tc.get("id", "")
-                tool_use_id = raw_id if raw_id.startswith("toolu_") else f"toolu_{uuid.uuid4().hex[:24]}"
+                tool_use_id = raw_id if raw_id.startswith("toolu_") else f"toolu_{secrets.token_hex(12)}"
                 content_blocks.append({
                     "type": "tool_use", "id": tool_use_id,
                     "name": func.get("name", ""), "input": tool_input,
@@ -1132,10 +1410,10 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
         if not content_blocks:
             content_blocks.append({"type": "text", "text": reasoning_text or ""})
 
-        stop_reason = "tool_use" if finish_reason == "tool_calls" else ("end_turn" if finish_reason == "stop" else finish_reason)
+        stop_reason = _STOP_REASONS.get(finish_reason, finish_reason)
 
         anthropic_resp = {
-            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "id": f"msg_{secrets.token_hex(12)}",
             "type": "message", "role": "assistant",
             "content": content_blocks, "model": model,
             "stop_reason": stop_reason, "stop_sequence": None,
@@ -1154,9 +1432,9 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
 
         self._respond(200, anthropic_resp)
 
-    def _handle_sync_as_sse(self, oai_request, model, req_id=0, t_start=None, msg_count=0, timeout=300, tool_names=None):
-        resp = urllib.request.urlopen(oai_request, timeout=timeout)
-        oai_resp = json.loads(resp.read())
+    def _handle_sync_as_sse(self, oai_body, model, req_id=0, t_start=None, msg_count=0, timeout=300, tool_names=None):
+        with _OLLAMA_POOL.urlopen("/v1/chat/completions", oai_body, timeout=timeout) as resp:
+            oai_resp = _read_json(resp)
         _log("resp_from_ollama_sse_meta", {
             "model": oai_resp.get("model"),
             "usage": oai_resp.get("usage"),
@@ -1168,13 +1446,13 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
 
         content_text, reasoning_text, tool_calls, finish_reason = self._process_ollama_response(oai_resp, current_tool_names=tool_names)
 
-        msg_id = f"msg_{uuid.uuid4().hex[:24]}"
+        msg_id = f"msg_{secrets.token_hex(12)}"
         self.send_response(200)
         self.send_header("Content-Type", "text/event-stream")
         self.send_header("Cache-Control", "no-cache")
         self.end_headers()
 
-        stop_reason = "tool_use" if finish_reason == "tool_calls" else ("end_turn" if finish_reason == "stop" else finish_reason)
+        stop_reason = _STOP_REASONS.get(finish_reason, finish_reason)
         input_tokens = oai_resp.get("usage", {}).get("prompt_tokens", 0)
         output_tokens = oai_resp.get("usage", {}).get("completion_tokens", 0)
 
@@ -1217,11 +1495,15 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
 
         for tc in tool_calls:
             func = tc.get("function", {})
+            # Valid arguments are already JSON text: forward them as-is
+            # instead of round-tripping through loads/dumps
+            args_str = func.get("arguments", "{}")
             try:
-                tool_input = json.loads(func.get("arguments", "{}"))
+                _loads(args_str)
+                partial_json = args_str
             except json.JSONDecodeError:
-                tool_input = {"raw": func.get("arguments", "")}
-            tool_use_id = f"toolu_{uuid.uuid4().hex[:24]}"
+                partial_json = _dumps({"raw": args_str}).decode("utf-8")
+            tool_use_id = f"toolu_{secrets.token_hex(12)}"
 
             self._send_sse("content_block_start", {
                 "type": "content_block_start", "index": block_index,
@@ -1229,7 +1511,7 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
             })
             self._send_sse("content_block_delta", {
                 "type": "content_block_delta", "index": block_index,
-                "delta": {"type": "input_json_delta", "partial_json": json.dumps(tool_input, ensure_ascii=False)},
+                "delta": {"type": "input_json_delta", "partial_json": partial_json},
             })
             self._send_sse("content_block_stop", {"type": "content_block_stop", "index": block_index})
             block_index += 1
@@ -1251,7 +1533,7 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
             "usage": {"output_tokens": output_tokens},
         })
         self._send_sse("message_stop", {"type": "message_stop"})
-        self.wfile.flush()
+        self._sse_flush()
 
         # Debug: log Anthropic SSE response summary and timing
         _debug_log(req_id, "anthropic_response_full", {
@@ -1265,14 +1547,18 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
         tool_names = [tc.get("function", {}).get("name", "") for tc in tool_calls] if tool_calls else None
         _debug_summary(req_id, model, msg_count, "sync", elapsed_ms, True, stop_reason, tool_names)
 
-    def _handle_stream(self, oai_request, model, req_id=0, t_start=None, msg_count=0, timeout=300):
-        resp = urllib.request.urlopen(oai_request, timeout=timeout)
+    def _handle_stream(self, oai_body, model, req_id=0, t_start=None, msg_count=0, timeout=300):
+        with _OLLAMA_POOL.urlopen("/v1/chat/completions", oai_body, timeout=timeout) as resp:
+            self._relay_stream(resp, model, req_id=req_id, t_start=t_start, msg_count=msg_count)
+
+    def _relay_stream(self, resp, model, req_id=0, t_start=None, msg_count=0):
+        """Translate an OpenAI chat completion stream into Anthropic SSE events."""
         self.send_response(200)
         self.send_header("Content-Type", "text/event-stream")
         self.send_header("Cache-Control", "no-cache")
         self.end_headers()
 
-        msg_id = f"msg_{uuid.uuid4().hex[:24]}"
+        msg_id = f"msg_{secrets.token_hex(12)}"
         self._send_sse("message_start", {
             "type": "message_start",
             "message": {
@@ -1283,6 +1569,7 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
                           "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0},
             },
         })
+        self._sse_flush()
 
         total_output_tokens = 0
         in_reasoning = False
@@ -1293,65 +1580,61 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
         accumulated_reasoning = []
         accumulated_content = []
 
-        # Buffered SSE reading (much faster than byte-by-byte)
-        buf = b""
-        while True:
-            chunk = resp.read(4096)
-            if not chunk:
+        # Line-buffered SSE reading: readline() pulls from the response's own
+        # buffer and returns as soon as a full line arrives (no over-read stalls)
+        for line_bytes in iter(resp.readline, b""):
+            line = line_bytes.strip()
+            if not line.startswith(b"data: "):
+                continue
+            data = line[6:]
+            if data == b"[DONE]":
                 break
-            buf += chunk
-            while b"\n" in buf:
-                line_bytes, buf = buf.split(b"\n", 1)
-                line = line_bytes.decode("utf-8", errors="replace").strip()
-                if not line.startswith("data: "):
-                    continue
-                data_str = line[6:]
-                if data_str == "[DONE]":
-                    buf = b""  # signal done
-                    break
-                try:
-                    oai_chunk = json.loads(data_str)
+            try:
+                text = _fast_stream_text(data)
+                if text is not None:
+                    reasoning = ""
+                else:
+                    oai_chunk = _loads(data.decode("utf-8", errors="replace"))
                     delta = oai_chunk.get("choices", [{}])[0].get("delta", {})
                     reasoning = delta.get("reasoning", "")
                     text = delta.get("content", "")
 
-                    if reasoning:
-                        accumulated_reasoning.append(reasoning)
-                        if not reasoning_started:
-                            reasoning_started = True
-                            in_reasoning = True
-                            self._send_sse("content_block_start", {
-                                "type": "content_block_start", "index": content_index,
-                                "content_block": {"type": "thinking", "thinking": ""},
-                            })
-                        total_output_tokens += 1
-                        self._send_sse("content_block_delta", {
-                            "type": "content_block_delta", "index": content_index,
-                            "delta": {"type": "thinking_delta", "thinking": reasoning},
+                if reasoning:
+                    accumulated_reasoning.append(reasoning)
+                    if not reasoning_started:
+                        reasoning_started = True
+                        in_reasoning = True
+                        self._send_sse("content_block_start", {
+                            "type": "content_block_start", "index": content_index,
+                            "content_block": {"type": "thinking", "thinking": ""},
                         })
+                    total_output_tokens += 1
+                    self._send_sse("content_block_delta", {
+                        "type": "content_block_delta", "index": content_index,
+                        "delta": {"type": "thinking_delta", "thinking": reasoning},
+                    })
 
-                    if text:
-                        accumulated_content.append(text)
-                        if in_reasoning:
-                            self._send_sse("content_block_stop", {"type": "content_block_stop", "index": content_index})
-                            content_index += 1
-                            in_reasoning = False
-                        if not content_started:
-                            content_started = True
-                            self._send_sse("content_block_start", {
-                                "type": "content_block_start", "index": content_index,
-                                "content_block": {"type": "text", "text": ""},
-                            })
-                        total_output_tokens += 1
-                        self._send_sse("content_block_delta", {
-                            "type": "content_block_delta", "index": content_index,
-                            "delta": {"type": "text_delta", "text": text},
+                if text:
+                    accumulated_content.append(text)
+                    if in_reasoning:
+                        self._send_sse("content_block_stop", {"type": "content_block_stop", "index": content_index})
+                        content_index += 1
+                        in_reasoning = False
+                    if not content_started:
+                        content_started = True
+                        self._send_sse("content_block_start", {
+                            "type": "content_block_start", "index": content_index,
+                            "content_block": {"type": "text", "text": ""},
                         })
-                except json.JSONDecodeError:
-                    continue
-            else:
+                    total_output_tokens += 1
+                    self._send_sse("content_block_delta", {
+                        "type": "content_block_delta", "index": content_index,
+                        "delta": {"type": "text_delta", "text": text},
+                    })
+            except json.JSONDecodeError:
                 continue
-            break  # [DONE] was received
+            # One write for all frames produced by this upstream chunk
+            self._sse_flush()
 
         if in_reasoning:
             self._send_sse("content_block_stop", {"type": "content_block_stop", "index": content_index})
@@ -1375,7 +1658,7 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
             "usage": {"output_tokens": total_output_tokens},
         })
         self._send_sse("message_stop", {"type": "message_stop"})
-        self.wfile.flush()
+        self._sse_flush()
 
         # Debug: log assembled stream response
         _debug_log(req_id, "stream_assembled_response", {
@@ -1388,39 +1671,14 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
 
     def _handle_count_tokens(self, req):
         # Collect all text for tokenization
-        all_text = []
-        messages = req.get("messages", [])
-        for msg in messages:
-            content = msg.get("content", "")
-            if isinstance(content, list):
-                for block in content:
-                    if isinstance(block, dict) and block.get("type") == "text":
-                        all_text.append(block.get("text", ""))
-            else:
-                all_text.append(str(content))
-        system = req.get("system", "")
-        if system:
-            if isinstance(system, list):
-                for block in system:
-                    if isinstance(block, dict):
-                        all_text.append(block.get("text", ""))
-            else:
-                all_text.append(str(system))
-
-        combined = "\n".join(all_text)
+        combined = "\n".join(_iter_count_texts(req))
 
         # A5: Try Ollama /api/tokenize for accurate count, fallback to len//4
         total = None
         try:
-            tok_body = json.dumps({"model": MAIN_MODEL, "text": combined}).encode("utf-8")
-            tok_req = urllib.request.Request(
-                f"{OLLAMA_BASE}/api/tokenize",
-                data=tok_body,
-                headers={"Content-Type": "application/json"},
-                method="POST",
-            )
-            tok_resp = urllib.request.urlopen(tok_req, timeout=5)
-            tok_data = json.loads(tok_resp.read())
+            tok_body = _dumps({"model": MAIN_MODEL, "text": combined})
+            with _OLLAMA_POOL.urlopen("/api/tokenize", tok_body, timeout=5) as tok_resp:
+                tok_data = _read_json(tok_resp)
             tokens = tok_data.get("tokens", None)
             if tokens is not None:
                 total = len(tokens)
@@ -1435,23 +1693,43 @@ class AnthropicToOllamaHandler(http.server.BaseHTTPRequestHandler):
         self._respond(200, {"input_tokens": total})
 
     def _send_sse(self, event_type, data):
+        """Queue one SSE frame. Frames are written out by _sse_flush()."""
+        prefix = _SSE_PREFIX.get(event_type)
+        if prefix is None:
+            prefix = f"event: {event_type}\ndata: ".encode("utf-8")
+        self._sse_buf += prefix
+        self._sse_buf += _dumps(data)
+        self._sse_buf += _SSE_SUFFIX
+
+    def _sse_flush(self):
+        """Write all queued SSE frames to the client in a single send."""
+        if not self._sse_buf:
+            return
         try:
-            line = f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
-            self.wfile.write(line.encode("utf-8"))
+            self.wfile.write(self._sse_buf)
             self.wfile.flush()
         except BrokenPipeError:
             pass
+        self._sse_buf.clear()
 
     def _respond(self, status, data):
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.end_headers()
-        self.wfile.write(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        self.wfile.write(_dumps(data))
 
 
 class ThreadedHTTPServer(http.server.HTTPServer):
     allow_reuse_address = True
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Fixed pool of daemon workers reused across requests. Daemon, like
+        # the old thread-per-request, so Ctrl+C never waits on a generation.
+        self._requests = queue.Queue()
+        for i in range(PROXY_WORKERS):
+            threading.Thread(target=self._worker, name=f"proxy_{i}", daemon=True).start()
+
     def server_bind(self):
         """Override to skip slow reverse DNS lookup (getfqdn).
         On some networks, socket.getfqdn('127.0.0.1') hangs for minutes
@@ -1465,9 +1743,15 @@ class ThreadedHTTPServer(http.server.HTTPServer):
         self.server_port = port
 
     def process_request(self, request, client_address):
-        t = threading.Thread(target=self._handle, args=(request, client_address))
-        t.daemon = True
-        t.start()
+        # Hand off to a pooled worker; excess connections queue until one frees up
+        self._requests.put((request, client_address))
+
+    def _worker(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            self._handle(*item)
 
     def _handle(self, request, client_address):
         try:
@@ -1477,6 +1761,20 @@ class ThreadedHTTPServer(http.server.HTTPServer):
         finally:
             self.shutdown_request(request)
 
+    def server_close(self):
+        super().server_close()
+        # Drop queued connections and stop idle workers. In-flight requests
+        # are not waited for: their daemon workers end with the process.
+        while True:
+            try:
+                item = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.shutdown_request(item[0])
+        for _ in range(PROXY_WORKERS):
+            self._requests.put(None)
+
 
 def main():
     port = int(sys.argv[1]) if len(sys.argv) > 1 else PROXY_PORT
@@ -1485,10 +1783,13 @@ def main():
     print(f"[proxy] Ollama backend: {OLLAMA_BASE}")
     print(f"[proxy] Main model: {MAIN_MODEL}")
     print(f"[proxy] Sidecar model: {SIDECAR_MODEL}")
+    print(f"[proxy] Workers: {PROXY_WORKERS}")
     print(f"[proxy] Model routes: {len(MODEL_ROUTES)} rules")
     print(f"[proxy] Log dir: {LOG_DIR}")
     print(f"[proxy] Session: {os.path.basename(SESSION_DIR)}")
     print(f"[proxy] Debug mode: {'ON' if DEBUG_MODE else 'OFF'}")
+    print(f"[proxy] Metadata logs: {'ON' if LOG_ENABLED else 'OFF'}")
+    print(f"[proxy] JSON backend: {'orjson' if HAS_ORJSON else 'stdlib json'}")
     print(f"[proxy] XML tool call fallback: enabled")
     print(f"[proxy] Ctrl+C to stop")
 
@@ -1499,9 +1800,9 @@ def main():
     def _warmup():
         for m in set([MAIN_MODEL, SIDECAR_MODEL]):
             try:
-                body = json.dumps({"model": m, "messages": [{"role": "user", "content": "hi"}], "max_tokens": 1, "stream": False}).encode()
-                req = urllib.request.Request(f"{OLLAMA_BASE}/v1/chat/completions", data=body, headers={"Content-Type": "application/json"})
-                urllib.request.urlopen(req, timeout=120)
+                body = _dumps({"model": m, "messages": [{"role": "user", "content": "hi"}], "max_tokens": 1, "stream": False})
+                with _OLLAMA_POOL.urlopen("/v1/chat/completions", body, timeout=120) as resp:
+                    resp.read()
                 print(f"[proxy] Warmup OK: {m}")
             except Exception as e:
                 print(f"[proxy] Warmup failed for {m}: {e}")
@@ -3,6 +3,7 @@
 
 Usage:
     python3 test_scroll_region.py
+    VIBE_FAST_TEST=1 python3 test_scroll_region.py   # skip visual pacing
 
 Tests the Reset-Draw-Restore pattern used by vibe-coder's ScrollRegion.
 If this script works correctly, vibe-coder's footer should also work.
@@ -13,6 +14,37 @@ import sys
 import time
 import shutil
 
+DIM = "\033[38;5;240m"
+CYAN = "\033[38;5;51m"
+PINK = "\033[38;5;198m"
+GREEN = "\033[38;5;82m"
+RST = "\033[0m"
+BANNER = f"{CYAN}{'=' * 50}{RST}"
+
+# Visual pacing is only for a human watching; VIBE_FAST_TEST=1 skips it
+_FAST = os.environ.get("VIBE_FAST_TEST") == "1"
+
+
+def _pause(seconds):
+    if not _FAST:
+        time.sleep(seconds)
+
+
+def _emit(buf):
+    """Write a whole test step's escape sequences + text as one OS write."""
+    sys.stdout.flush()
+    os.write(sys.stdout.fileno(), buf.encode("utf-8"))
+
+
+def _scroll_lines(lines, delay):
+    """Print lines paced for a human, or as one write under VIBE_FAST_TEST."""
+    if _FAST:
+        _emit("".join(line + "\n" for line in lines))
+        return
+    for line in lines:
+        print(line)
+        time.sleep(delay)
+
 
 def main():
     if not sys.stdout.isatty():
@@ -30,55 +62,47 @@ def main():
         print(f"ERROR: Terminal too small ({rows} rows, need >=10).")
         return 1
 
-    DIM = "\033[38;5;240m"
-    CYAN = "\033[38;5;51m"
-    PINK = "\033[38;5;198m"
-    GREEN = "\033[38;5;82m"
-    RST = "\033[0m"
-
     STATUS_ROWS = 3
     scroll_end = rows - STATUS_ROWS
     sep_row = rows - 2
     status_row = rows - 1
     hint_row = rows
+    sep_line = f"{DIM}{'═' * cols}{RST}"
 
-    print(f"{CYAN}{'=' * 50}{RST}")
+    print(BANNER)
     print(f"{CYAN}DECSTBM Scroll Region Test{RST}")
     print(f"{DIM}Terminal: {cols}x{rows}  TERM={os.environ.get('TERM', '?')}{RST}")
     print(f"{DIM}Scroll region: rows 1-{scroll_end}, footer: rows {sep_row}-{hint_row}{RST}")
-    print(f"{CYAN}{'=' * 50}{RST}")
+    print(BANNER)
     print()
 
     # --- Test 1: Initial footer draw + DECSTBM setup ---
     print(f"{CYAN}[Test 1] Draw footer BEFORE DECSTBM, then set scroll region{RST}")
-    time.sleep(0.5)
+    _pause(0.5)
 
-    footer = f"\033[{sep_row};1H\033[2K{DIM}{'═' * cols}{RST}"
+    footer = f"\033[{sep_row};1H\033[2K{sep_line}"
     footer += f"\033[{status_row};1H\033[2K {GREEN}STATUS: Initial draw OK{RST}"
     footer += f"\033[{hint_row};1H\033[2K {DIM}HINT: Press nothing, just watch{RST}"
 
     buf = footer
     buf += f"\033[1;{scroll_end}r"
     buf += f"\033[{scroll_end};1H"
-    sys.stdout.write(buf)
-    sys.stdout.flush()
-
-    print(f"  {GREEN}✓ Footer + DECSTBM set{RST}")
-    time.sleep(1)
+    buf += f"  {GREEN}✓ Footer + DECSTBM set{RST}\n"
+    _emit(buf)
+    _pause(1)
 
     # --- Test 2: Scrolling within region ---
     print(f"\n{CYAN}[Test 2] Scrolling within DECSTBM region{RST}")
-    for i in range(8):
-        print(f"  {DIM}Scroll line {i + 1}/8 — footer should stay fixed below{RST}")
-        time.sleep(0.2)
+    _scroll_lines([f"  {DIM}Scroll line {i + 1}/8 — footer should stay fixed below{RST}"
+                   for i in range(8)], 0.2)
 
     print(f"  {GREEN}✓ Scrolling complete{RST}")
-    time.sleep(0.5)
+    _pause(0.5)
 
     # --- Test 3: Reset-Draw-Restore status update ---
     print(f"\n{CYAN}[Test 3] Reset-Draw-Restore: update status mid-scroll{RST}")
 
-    footer2 = f"\033[{sep_row};1H\033[2K{DIM}{'═' * cols}{RST}"
+    footer2 = f"\033[{sep_row};1H\033[2K{sep_line}"
     footer2 += f"\033[{status_row};1H\033[2K {PINK}STATUS: Updated via Reset-Draw-Restore!{RST}"
     footer2 += f"\033[{hint_row};1H\033[2K {DIM}HINT: Status changed? Good!{RST}"
 
@@ -86,38 +110,32 @@ def main():
     buf2 += footer2                          # Draw footer
     buf2 += f"\033[1;{scroll_end}r"         # Restore margins
     buf2 += f"\033[{scroll_end};1H"         # Cursor back
-    sys.stdout.flush()
-    os.write(sys.stdout.fileno(), buf2.encode("utf-8"))
-
-    print(f"  {GREEN}✓ Status updated{RST}")
-    time.sleep(1)
+    buf2 += f"  {GREEN}✓ Status updated{RST}\n"
+    _emit(buf2)
+    _pause(1)
 
     # --- Test 4: More scrolling after update ---
     print(f"\n{CYAN}[Test 4] Continue scrolling after status update{RST}")
-    for i in range(5):
-        print(f"  {DIM}Post-update scroll {i + 1}/5{RST}")
-        time.sleep(0.2)
+    _scroll_lines([f"  {DIM}Post-update scroll {i + 1}/5{RST}" for i in range(5)], 0.2)
 
     print(f"  {GREEN}✓ Post-update scrolling OK{RST}")
-    time.sleep(0.5)
+    _pause(0.5)
 
     # --- Cleanup ---
     buf3 = f"\033[1;{rows}r"
     buf3 += f"\033[{rows - 2};1H\033[J"
     buf3 += f"\033[{rows};1H"
-    sys.stdout.flush()
-    os.write(sys.stdout.fileno(), buf3.encode("utf-8"))
-
-    print(f"\n{CYAN}{'=' * 50}{RST}")
-    print(f"{CYAN}Results:{RST}")
-    print(f"  {GREEN}✓{RST} Separator (═) visible at row {sep_row}  → DECSTBM footer works")
-    print(f"  {GREEN}✓{RST} Scroll lines above separator    → DECSTBM scrolling works")
-    print(f"  {GREEN}✓{RST} Status updated without '[' leak  → Reset-Draw-Restore works")
-    print(f"  {GREEN}✓{RST} Post-update scrolling intact     → Margin restore works")
-    print()
-    print(f"  {DIM}If any test showed artifacts or missing footer:{RST}")
-    print(f"  {PINK}→ Set VIBE_NO_SCROLL=1 to disable scroll region in vibe-coder{RST}")
-    print(f"{CYAN}{'=' * 50}{RST}")
+    buf3 += f"\n{BANNER}\n"
+    buf3 += f"{CYAN}Results:{RST}\n"
+    buf3 += f"  {GREEN}✓{RST} Separator (═) visible at row {sep_row}  → DECSTBM footer works\n"
+    buf3 += f"  {GREEN}✓{RST} Scroll lines above separator    → DECSTBM scrolling works\n"
+    buf3 += f"  {GREEN}✓{RST} Status updated without '[' leak  → Reset-Draw-Restore works\n"
+    buf3 += f"  {GREEN}✓{RST} Post-update scrolling intact     → Margin restore works\n"
+    buf3 += "\n"
+    buf3 += f"  {DIM}If any test showed artifacts or missing footer:{RST}\n"
+    buf3 += f"  {PINK}→ Set VIBE_NO_SCROLL=1 to disable scroll region in vibe-coder{RST}\n"
+    buf3 += f"{BANNER}\n"
+    _emit(buf3)
     return 0
 
 
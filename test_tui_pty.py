@@ -16,81 +16,108 @@ Usage:
 import os
 import sys
 import pty
-import time
 import struct
 import fcntl
 import termios
-import select
+import selectors
 import io
+import re
 
 
 # ──────────────────────────────────────────────────────────────────────────
 # MiniScreen: minimal VT100 emulator for verifying rendered output
 # ──────────────────────────────────────────────────────────────────────────
+# CSI: ESC [ params final — one C-level match instead of a per-char scan
+_CSI_RE = re.compile(r'\033\[([\d;?]*)([^\d;?])')
+# Any complete CSI sequence in raw PTY output (stray-bracket check)
+_CSI_SEQ_RE = re.compile(rb'\x1b\[[^A-Za-z]*[A-Za-z]')
+
+# Grid cells are fixed-width UTF-32 so box-drawing chars fit in one cell
+_CELL_ENC = 'utf-32-le'
+_CELL = 4
+_BLANK = ' '.encode(_CELL_ENC)
+
+# C0 controls MiniScreen acts on; every other C0 char is dropped from text
+_CTRL_CHARS = '\033\r\n\t\b'
+_DROP_C0 = dict.fromkeys(c for c in range(32) if chr(c) not in _CTRL_CHARS)
+_CTRL_RE = re.compile(f'[{_CTRL_CHARS}]')
+
+
 class MiniScreen:
     """Minimal VT100 terminal emulator for testing."""
 
     def __init__(self, rows, cols):
         self.rows = rows
         self.cols = cols
-        self.grid = [[' '] * cols for _ in range(rows)]
+        self.stride = cols * _CELL
+        self.buf = bytearray(_BLANK * (rows * cols))
+        # Decoded row text; None marks a row written since the last read
+        self._row_cache = [None] * rows
         self.cur_r = 0
         self.cur_c = 0
         self.scroll_top = 0
         self.scroll_bot = rows - 1
         self._saved_r = 0
         self._saved_c = 0
+        self._controls = {
+            '\r': self._carriage_return,
+            '\n': self._linefeed,
+            '\t': self._tab,
+            '\b': self._backspace,
+        }
 
     def feed(self, data):
         """Process terminal output string."""
+        controls = self._controls
         i = 0
-        while i < len(data):
+        n = len(data)
+        while i < n:
             ch = data[i]
-            if ch == '\033' and i + 1 < len(data):
-                if data[i + 1] == '[':
-                    j = i + 2
-                    params = ""
-                    while j < len(data) and (data[j].isdigit() or data[j] == ';' or data[j] == '?'):
-                        params += data[j]
-                        j += 1
-                    if j < len(data):
-                        cmd = data[j]
-                        self._handle_csi(params, cmd)
-                        i = j + 1
-                        continue
-                i += 1
-            elif ch == '\r':
-                self.cur_c = 0
-                i += 1
-            elif ch == '\n':
-                if self.cur_r >= self.scroll_bot:
-                    self._scroll_up()
-                else:
-                    self.cur_r += 1
-                i += 1
-            elif ch == '\t':
-                self.cur_c = min(self.cur_c + (8 - self.cur_c % 8), self.cols - 1)
-                i += 1
-            elif ch == '\b':
-                if self.cur_c > 0:
-                    self.cur_c -= 1
-                i += 1
-            elif ord(ch) >= 32:
-                if self.cur_c < self.cols:
-                    self.grid[self.cur_r][self.cur_c] = ch
-                    self.cur_c += 1
-                elif self.cur_c >= self.cols:
-                    self.cur_c = 0
-                    if self.cur_r >= self.scroll_bot:
-                        self._scroll_up()
-                    else:
-                        self.cur_r += 1
-                    if self.cur_c < self.cols:
-                        self.grid[self.cur_r][self.cur_c] = ch
-                        self.cur_c += 1
-                i += 1
+            if ch == '\033':
+                m = _CSI_RE.match(data, i)
+                if m:
+                    self._handle_csi(m.group(1), m.group(2))
+                    i = m.end()
+                    continue
+            elif ch in controls:
+                controls[ch]()
             else:
-                i += 1
+                # Plain text up to the next handled control, minus ignored C0s
+                m = _CTRL_RE.search(data, i)
+                j = m.start() if m else n
+                self._write_run(data[i:j].translate(_DROP_C0))
+                i = j
+                continue
+            i += 1
+
+    def _write_run(self, run):
+        """Write printable text, one slice assignment per row it touches."""
+        while run:
+            if self.cur_c >= self.cols:
+                self.cur_c = 0
+                self._linefeed()
+            n = min(len(run), self.cols - self.cur_c)
+            off = self.cur_r * self.stride + self.cur_c * _CELL
+            self.buf[off:off + n * _CELL] = run[:n].encode(_CELL_ENC, 'surrogatepass')
+            self._row_cache[self.cur_r] = None
+            self.cur_c += n
+            run = run[n:]
+
+    def _carriage_return(self):
+        self.cur_c = 0
+
+    def _linefeed(self):
+        if self.cur_r >= self.scroll_bot:
+            self._scroll_up()
+        else:
+            self.cur_r += 1
+
+    def _tab(self):
+        self.cur_c = min(self.cur_c + (8 - self.cur_c % 8), self.cols - 1)
+
+    def _backspace(self):
+        if self.cur_c > 0:
+            self.cur_c -= 1
 
     def _handle_csi(self, params, cmd):
         parts = params.split(';') if params else []
@@ -110,17 +137,20 @@ class MiniScreen:
         elif cmd == 'J':
             n = nums[0] if nums else 0
             if n == 0:
-                self.grid[self.cur_r][self.cur_c:] = [' '] * (self.cols - self.cur_c)
-                for row in range(self.cur_r + 1, self.rows):
-                    self.grid[row] = [' '] * self.cols
+                off = self.cur_r * self.stride + self.cur_c * _CELL
+                self.buf[off:] = _BLANK * ((len(self.buf) - off) // _CELL)
+                self._damage(self.cur_r, self.rows - 1)
             elif n == 2:
-                self.grid = [[' '] * self.cols for _ in range(self.rows)]
+                self.buf[:] = _BLANK * (self.rows * self.cols)
+                self._damage(0, self.rows - 1)
         elif cmd == 'K':
             n = nums[0] if nums else 0
+            row = self.cur_r * self.stride
             if n == 0:
-                self.grid[self.cur_r][self.cur_c:] = [' '] * (self.cols - self.cur_c)
+                self.buf[row + self.cur_c * _CELL:row + self.stride] = _BLANK * (self.cols - self.cur_c)
             elif n == 2:
-                self.grid[self.cur_r] = [' '] * self.cols
+                self.buf[row:row + self.stride] = _BLANK * self.cols
+            self._row_cache[self.cur_r] = None
         elif cmd == 'r':
             top = (nums[0] if len(nums) > 0 and nums[0] > 0 else 1) - 1
             bot = (nums[1] if len(nums) > 1 and nums[1] > 0 else self.rows) - 1
@@ -144,19 +174,34 @@ class MiniScreen:
             self.cur_r = min(self.scroll_bot, self.cur_r + n)
 
     def _scroll_up(self):
-        del self.grid[self.scroll_top]
-        self.grid.insert(self.scroll_bot, [' '] * self.cols)
+        # Two memmove-backed slice ops instead of list splicing
+        top = self.scroll_top * self.stride
+        bot = self.scroll_bot * self.stride
+        del self.buf[top:top + self.stride]
+        self.buf[bot:bot] = _BLANK * self.cols
+        self._damage(min(self.scroll_top, self.scroll_bot), max(self.scroll_top, self.scroll_bot))
+
+    def _damage(self, first, last):
+        self._row_cache[first:last + 1] = [None] * (last + 1 - first)
+
+    def _row_text(self, idx):
+        text = self._row_cache[idx]
+        if text is None:
+            off = idx * self.stride
+            text = self.buf[off:off + self.stride].decode(_CELL_ENC, 'surrogatepass').rstrip()
+            self._row_cache[idx] = text
+        return text
 
     def get_row(self, row_1based):
         idx = row_1based - 1
         if 0 <= idx < self.rows:
-            return ''.join(self.grid[idx]).rstrip()
+            return self._row_text(idx)
         return ''
 
     def dump(self):
         lines = []
         for i in range(self.rows):
-            text = ''.join(self.grid[i]).rstrip()
+            text = self._row_text(i)
             lines.append(f"  {i+1:2d} |{text}|")
         return '\n'.join(lines)
 
@@ -164,10 +209,19 @@ class MiniScreen:
 # ──────────────────────────────────────────────────────────────────────────
 # Import vibe-coder
 # ──────────────────────────────────────────────────────────────────────────
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_VC = None
+
+
 def _import_vc():
-    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    import importlib
-    return importlib.import_module("vibe-coder")
+    """Import vibe-coder once; later calls return the cached module."""
+    global _VC
+    if _VC is None:
+        if _HERE not in sys.path:
+            sys.path.insert(0, _HERE)
+        import importlib
+        _VC = importlib.import_module("vibe-coder")
+    return _VC
 
 
 # ──────────────────────────────────────────────────────────────────────────
@@ -217,15 +271,18 @@ def test_update_status_is_store_only():
     vc = _import_vc()
     ROWS, COLS = 24, 80
 
+    # Active region set up directly, as in the other tests: setup()'s own
+    # output is covered by test_setup_writes_footer.
     sr = vc.ScrollRegion()
+    sr._rows = ROWS
+    sr._cols = COLS
+    sr._scroll_end = ROWS - 3
+    sr._active = True
+
     buf = io.StringIO()
     import unittest.mock as mock
-    with mock.patch('shutil.get_terminal_size', return_value=os.terminal_size((COLS, ROWS))):
-        with mock.patch('sys.stdout', buf):
-            sr.setup()
-            buf.truncate(0)
-            buf.seek(0)
-            sr.update_status("Thinking... (3s)")
+    with mock.patch('sys.stdout', buf):
+        sr.update_status("Thinking... (3s)")
 
     output = buf.getvalue()
     print(f"\n=== Test: update_status is store-only ===")
@@ -235,6 +292,28 @@ def test_update_status_is_store_only():
     print(f"  ✓ Store-only: no terminal write")
 
 
+def test_setup_writes_footer():
+    """setup() writes the footer and scroll region in one go."""
+    vc = _import_vc()
+    ROWS, COLS = 24, 80
+
+    sr = vc.ScrollRegion()
+    buf = io.StringIO()
+    import unittest.mock as mock
+    with mock.patch('shutil.get_terminal_size', return_value=os.terminal_size((COLS, ROWS))):
+        with mock.patch('sys.stdout', buf):
+            sr.setup()
+
+    screen = MiniScreen(ROWS, COLS)
+    screen.feed(buf.getvalue())
+    print(f"\n=== Test: setup() writes footer ===")
+    assert sr._active
+    assert '─' in screen.get_row(22), "setup() did not draw the separator"
+    assert 'ESC' in screen.get_row(24), "setup() did not draw the hint"
+    assert (screen.scroll_top, screen.scroll_bot) == (0, ROWS - 4)
+    print(f"  ✓ Footer drawn, scroll region rows 1-{ROWS - 3}")
+
+
 # ──────────────────────────────────────────────────────────────────────────
 # Test 3: Scrolling preserves footer
 # ──────────────────────────────────────────────────────────────────────────
@@ -260,8 +339,7 @@ def test_scrolling_preserves_footer():
     screen.feed(buf)
 
     # Print 30 lines (causes scrolling within the region)
-    for i in range(30):
-        screen.feed(f"Line {i+1}: test output\r\n")
+    screen.feed("".join(f"Line {i+1}: test output\r\n" for i in range(30)))
 
     sep = screen.get_row(22)
     status = screen.get_row(23)
@@ -307,8 +385,7 @@ def test_inline_r_status():
     screen.feed(buf)
 
     # Simulate inline status (the actual approach used by spinner/thinking/tool status)
-    for i in range(10):
-        screen.feed(f"\r  ◠ Step {i}/9    ")
+    screen.feed("".join(f"\r  ◠ Step {i}/9    " for i in range(10)))
     # Clear it
     screen.feed(f"\r{' ' * 40}\r")
 
@@ -413,39 +490,37 @@ def test_live_pty_escape_sequences():
 
         os.write(slave_fd, buf.encode("utf-8"))
 
-        # Read what comes out on the master side
-        time.sleep(0.1)
+        # Read what comes out on the master side. Wait a little longer for
+        # the first chunk; once data has arrived, the first idle poll means
+        # the PTY has been drained.
         output = b""
-        while True:
-            r, _, _ = select.select([master_fd], [], [], 0.2)
-            if r:
+        sel = selectors.DefaultSelector()
+        sel.register(master_fd, selectors.EVENT_READ)
+        try:
+            while sel.select(0.05 if output else 0.5):
                 try:
-                    chunk = os.read(master_fd, 16384)
-                    if chunk:
-                        output += chunk
-                    else:
-                        break
+                    chunk = os.read(master_fd, 65536)
                 except OSError:
                     break
-            else:
-                break
+                if not chunk:
+                    break
+                output += chunk
+        finally:
+            sel.close()
 
-        decoded = output.decode("utf-8", errors="replace")
         print(f"\n=== Test: Live PTY escape sequences ===")
-        print(f"  Wrote {len(buf)} chars, read back {len(decoded)} chars")
+        print(f"  Wrote {len(buf)} chars, read back {len(output)} bytes")
 
         # The output through PTY should contain our text
-        assert '─' in decoded, "Separator char missing from PTY output"
-        assert 'Ready' in decoded, "'Ready' missing from PTY output"
-        assert 'ESC' in decoded, "'ESC' missing from PTY output"
+        assert '─'.encode("utf-8") in output, "Separator char missing from PTY output"
+        assert b'Ready' in output, "'Ready' missing from PTY output"
+        assert b'ESC' in output, "'ESC' missing from PTY output"
 
         # Verify no broken escape sequences (stray '[')
         # Remove valid ESC[ sequences first
-        clean = decoded
-        import re
-        clean = re.sub(r'\033\[[^a-zA-Z]*[a-zA-Z]', '', clean)
+        clean = _CSI_SEQ_RE.sub(b'', output)
         # After removing all valid CSI sequences, there should be no lone '['
-        lone_brackets = clean.count('[')
+        lone_brackets = clean.count(b'[')
         assert lone_brackets == 0, f"Found {lone_brackets} stray '[' after removing CSI sequences"
 
         print(f"  ✓ PTY echoes correct escape sequences, no stray brackets")
@@ -486,8 +561,7 @@ def test_full_lifecycle_screen_dumps():
     assert 'Ready' in screen.get_row(23), "Setup: status missing"
 
     # Timing 2: After some output
-    for i in range(5):
-        screen.feed(f"Output line {i+1}\r\n")
+    screen.feed("".join(f"Output line {i+1}\r\n" for i in range(5)))
     timing_dumps["after_output"] = screen.dump()
 
     assert '─' in screen.get_row(22), "After output: separator corrupted"
@@ -508,8 +582,7 @@ def test_full_lifecycle_screen_dumps():
     assert '─' in screen.get_row(22), "After clear: separator corrupted"
 
     # Timing 5: After heavy scrolling (stress test)
-    for i in range(50):
-        screen.feed(f"Stress line {i+1}\r\n")
+    screen.feed("".join(f"Stress line {i+1}\r\n" for i in range(50)))
     timing_dumps["after_stress"] = screen.dump()
 
     assert '─' in screen.get_row(22), "After stress: separator corrupted"
@@ -534,6 +607,7 @@ def main():
     tests = [
         ("Setup footer rendering", test_setup_renders_footer),
         ("update_status is store-only", test_update_status_is_store_only),
+        ("setup() writes footer", test_setup_writes_footer),
         ("Scrolling preserves footer", test_scrolling_preserves_footer),
         ("Inline \\r status safe", test_inline_r_status),
         ("Teardown-store-setup cycle", test_teardown_store_setup_cycle),
@@ -0,0 +1,136 @@
+"""
+Shared pytest fixtures for the vibe-coder test suite.
+"""
+
+import importlib.util
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# ---------------------------------------------------------------------------
+# Import vibe-coder once per session (hyphenated filename requires importlib).
+# Test modules pick it up with "import vibe_coder as vc" from sys.modules.
+# ---------------------------------------------------------------------------
+VIBE_LOCAL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if VIBE_LOCAL_DIR not in sys.path:
+    sys.path.insert(0, VIBE_LOCAL_DIR)
+
+if "vibe_coder" not in sys.modules:
+    # Force sys.stdout.isatty() to return True so that C colors remain enabled
+    # during import (the module disables colors when not a TTY).
+    _orig_isatty = sys.stdout.isatty
+    sys.stdout.isatty = lambda: True
+    try:
+        _spec = importlib.util.spec_from_file_location(
+            "vibe_coder", os.path.join(VIBE_LOCAL_DIR, "vibe-coder.py"))
+        _vc = importlib.util.module_from_spec(_spec)
+        sys.modules["vibe_coder"] = _vc
+        _spec.loader.exec_module(_vc)
+    finally:
+        sys.stdout.isatty = _orig_isatty
+
+
+@pytest.fixture(scope="session")
+def vc():
+    """The vibe-coder module, imported once for the whole session."""
+    return sys.modules["vibe_coder"]
+
+
+@pytest.fixture(scope="session")
+def scratch(tmp_path_factory):
+    """Session-wide scratch directory for small test files.
+
+    Lives on tmpfs (/dev/shm) when available so file tests never touch the
+    block layer; falls back to pytest's own temp root elsewhere (macOS).
+    Removed once at the end of the session.
+    """
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        root = Path(tempfile.mkdtemp(prefix="vibe-test-", dir=shm))
+    else:
+        root = tmp_path_factory.mktemp("vibe")
+    yield root
+    shutil.rmtree(root, ignore_errors=True)
+
+
+# Canonical mini project used by the read-only GlobTool tests
+_SAMPLE_TREE = {
+    "top.py": "code",
+    "main.py": "code",
+    "test.py": "code",
+    "test.txt": "text",
+    "app.js": "code",
+    "sub/deep.py": "code",
+    "node_modules/pkg.js": "code",
+    ".git/config": "data",
+}
+
+
+@pytest.fixture(scope="session")
+def sample_tree(scratch):
+    """Materialize _SAMPLE_TREE once per session and return its root.
+
+    Treat it as read-only; a test that needs to modify files should clone
+    it cheaply with shutil.copytree(sample_tree, dst, copy_function=os.link).
+    """
+    root = scratch / "sample_tree"
+    for rel, data in _SAMPLE_TREE.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(data)
+    return root
+
+
+@pytest.fixture
+def auto_detect(monkeypatch, vc):
+    """Pin the inputs of Config._auto_detect_model for one test.
+
+    auto_detect(ram_gb, installed_models, vram=0) patches RAM/VRAM
+    detection and the Ollama model query; monkeypatch restores them.
+    """
+    def _apply(ram, models, vram=0):
+        monkeypatch.setattr(vc, "_get_ram_gb", lambda: ram)
+        monkeypatch.setattr(vc, "_get_vram_gb", lambda: vram)
+        monkeypatch.setattr(vc.Config, "_query_installed_models",
+                            lambda self: list(models))
+    return _apply
+
+
+_tmpfile_seq = itertools.count()
+
+
+@pytest.fixture
+def tmpfile(scratch):
+    """Factory writing throwaway input files into the scratch dir.
+
+    tmpfile(data, suffix=".txt") writes *data* (str as UTF-8, or bytes) to
+    a fresh, uniquely numbered file and returns its path as a str. No
+    per-test cleanup: the scratch dir is removed at session end.
+    """
+    def _make(data="", suffix=".txt"):
+        path = scratch / f"t{next(_tmpfile_seq)}{suffix}"
+        path.write_bytes(data if isinstance(data, bytes) else data.encode("utf-8"))
+        return str(path)
+    return _make
+
+
+# File tools carry no per-instance state (name/description/parameters are
+# class attributes), so one instance per test class is enough.
+@pytest.fixture(scope="class")
+def read_tool(vc):
+    return vc.ReadTool()
+
+
+@pytest.fixture(scope="class")
+def write_tool(vc):
+    return vc.WriteTool()
+
+
+@pytest.fixture(scope="class")
+def edit_tool(vc):
+    return vc.EditTool()
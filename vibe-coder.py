@@ -31,15 +31,20 @@ import urllib.request
 import urllib.error
 import urllib.parse
 import hashlib
+import heapq
+import http.client
+import io
 import traceback
 import base64
 import atexit
+import stat
 import struct
 import sqlite3
 from abc import ABC, abstractmethod
 from datetime import datetime
 import collections
 import concurrent.futures
+import functools
 
 # readline is not available on Windows
 try:
@@ -57,6 +62,13 @@ try:
 except ImportError:
     HAS_TERMIOS = False
 
+# orjson (optional) speeds up session loading; stdlib json is the fallback
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 # Thread-safe stdout lock
 _print_lock = threading.Lock()
 from pathlib import Path
@@ -427,27 +439,38 @@ class ScrollRegion:
         Caller must hold self._lock."""
         if not self._active:
             return ""
-        sep_row = self._rows - 2
-        status_row = self._rows - 1
-        hint_row = self._rows
+        return _footer_payload(self._rows, self._cols,
+                               self._status_text or "", self._hint_text or "")
 
-        _dim = "\033[38;5;240m"
-        _sep_color = "\033[38;5;245m"   # brighter than _dim for visibility
-        _rst = "\033[0m"
 
-        # Build entire footer as one string (prevents escape sequence fragmentation)
-        buf = f"\033[{sep_row};1H\033[2K{_sep_color}{'─' * self._cols}{_rst}"
+_FOOTER_DIM = "\033[38;5;240m"
+_FOOTER_SEP_COLOR = "\033[38;5;245m"   # brighter than _FOOTER_DIM for visibility
+_FOOTER_RST = "\033[0m"
+_FOOTER_HINT_PREFIX = f" {_FOOTER_DIM}ESC: stop"
 
-        status = self._status_text or ""
-        buf += f"\033[{status_row};1H\033[2K {status}{_rst}"
 
-        hint = self._hint_text or ""
-        hint_prefix = f" {_dim}ESC: stop"
-        if hint:
-            buf += f"\033[{hint_row};1H\033[2K{hint_prefix} | type-ahead: \"{hint}\"{_rst}"
-        else:
-            buf += f"\033[{hint_row};1H\033[2K{hint_prefix}{_rst}"
-        return buf
+@functools.lru_cache(maxsize=8)
+def _footer_payload(rows, cols, status, hint):
+    """Footer escape sequences for ScrollRegion (pure function of its args).
+
+    Cached because the footer is redrawn with the same size/status/hint
+    on every setup() and resize().
+    """
+    sep_row = rows - 2
+    status_row = rows - 1
+    hint_row = rows
+    _rst = _FOOTER_RST
+
+    # Build entire footer as one string (prevents escape sequence fragmentation)
+    buf = f"\033[{sep_row};1H\033[2K{_FOOTER_SEP_COLOR}{'─' * cols}{_rst}"
+
+    buf += f"\033[{status_row};1H\033[2K {status}{_rst}"
+
+    if hint:
+        buf += f"\033[{hint_row};1H\033[2K{_FOOTER_HINT_PREFIX} | type-ahead: \"{hint}\"{_rst}"
+    else:
+        buf += f"\033[{hint_row};1H\033[2K{_FOOTER_HINT_PREFIX}{_rst}"
+    return buf
 
 
 def _debug_scroll_region(tui):
@@ -690,6 +713,14 @@ class InputMonitor:
 # Config
 # ════════════════════════════════════════════════════════════════════════════════
 
+# Parsed config files: path -> ((mtime_ns, size), [(key, value), ...])
+_CONFIG_CACHE = {}
+
+# Installed Ollama models: host -> (monotonic timestamp, model names)
+_INSTALLED_MODELS_CACHE = {}
+_INSTALLED_MODELS_TTL = 30
+
+
 class Config:
     """Configuration from CLI args, config file, and environment variables."""
 
@@ -768,55 +799,77 @@ class Config:
                 continue
             self._parse_config_file(cfg_path)
 
+    @staticmethod
+    def _clear_config_cache():
+        """Forget parsed config files (next _parse_config_file re-reads)."""
+        _CONFIG_CACHE.clear()
+
+    @staticmethod
+    def _read_config_entries(cfg_path):
+        """Read KEY=value lines from a config file, in file order."""
+        entries = []
+        with open(cfg_path, encoding="utf-8-sig") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if "=" not in line:
+                    continue
+                key, val = line.split("=", 1)
+                key = key.strip()
+                val = val.strip().strip("\"'")
+                if val:
+                    entries.append((key, val))
+        return entries
+
     def _parse_config_file(self, cfg_path):
         try:
-            with open(cfg_path, encoding="utf-8-sig") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith("#"):
-                        continue
-                    if "=" not in line:
-                        continue
-                    key, val = line.split("=", 1)
-                    key = key.strip()
-                    val = val.strip().strip("\"'")
-                    if key == "MODEL" and val:
-                        self.model = val
-                    elif key == "SIDECAR_MODEL" and val:
-                        self.sidecar_model = val
-                    elif key == "OLLAMA_HOST" and val:
-                        self.ollama_host = val
-                    elif key == "MAX_TOKENS" and val:
-                        try:
-                            self.max_tokens = int(val)
-                        except ValueError:
-                            pass
-                    elif key == "TEMPERATURE" and val:
-                        try:
-                            self.temperature = float(val)
-                        except ValueError:
-                            pass
-                    elif key == "CONTEXT_WINDOW" and val:
-                        try:
-                            self.context_window = int(val)
-                        except ValueError:
-                            pass
+            st = os.stat(cfg_path)
+            sig = (st.st_mtime_ns, st.st_size)
+            cached = _CONFIG_CACHE.get(cfg_path)
+            if cached is not None and cached[0] == sig:
+                entries = cached[1]
+            else:
+                entries = self._read_config_entries(cfg_path)
+                _CONFIG_CACHE[cfg_path] = (sig, entries)
         except (OSError, IOError):
-            pass  # Config file unreadable — skip silently
-
-    def _load_env(self):
-        if os.environ.get("OLLAMA_HOST"):
-            self.ollama_host = os.environ["OLLAMA_HOST"]
-        # VIBE_CODER_* are legacy env vars; VIBE_LOCAL_* take precedence (loaded second)
-        if os.environ.get("VIBE_CODER_MODEL"):
-            self.model = os.environ["VIBE_CODER_MODEL"]
-        if os.environ.get("VIBE_LOCAL_MODEL"):
-            self.model = os.environ["VIBE_LOCAL_MODEL"]
-        if os.environ.get("VIBE_CODER_SIDECAR"):
-            self.sidecar_model = os.environ["VIBE_CODER_SIDECAR"]
-        if os.environ.get("VIBE_LOCAL_SIDECAR_MODEL"):
-            self.sidecar_model = os.environ["VIBE_LOCAL_SIDECAR_MODEL"]
-        if os.environ.get("VIBE_CODER_DEBUG") == "1" or os.environ.get("VIBE_LOCAL_DEBUG") == "1":
+            return  # Config file unreadable — skip silently
+        for key, val in entries:
+            if key == "MODEL":
+                self.model = val
+            elif key == "SIDECAR_MODEL":
+                self.sidecar_model = val
+            elif key == "OLLAMA_HOST":
+                self.ollama_host = val
+            elif key == "MAX_TOKENS":
+                try:
+                    self.max_tokens = int(val)
+                except ValueError:
+                    pass
+            elif key == "TEMPERATURE":
+                try:
+                    self.temperature = float(val)
+                except ValueError:
+                    pass
+            elif key == "CONTEXT_WINDOW":
+                try:
+                    self.context_window = int(val)
+                except ValueError:
+                    pass
+
+    def _load_env(self, env=None):
+        """Apply environment overrides from *env* (defaults to os.environ)."""
+        get = (os.environ if env is None else env).get
+        # Later entries win: VIBE_CODER_* are legacy env vars, VIBE_LOCAL_* take precedence
+        for key, attr in (("OLLAMA_HOST", "ollama_host"),
+                          ("VIBE_CODER_MODEL", "model"),
+                          ("VIBE_LOCAL_MODEL", "model"),
+                          ("VIBE_CODER_SIDECAR", "sidecar_model"),
+                          ("VIBE_LOCAL_SIDECAR_MODEL", "sidecar_model")):
+            val = get(key)
+            if val:
+                setattr(self, attr, val)
+        if get("VIBE_CODER_DEBUG") == "1" or get("VIBE_LOCAL_DEBUG") == "1":
             self.debug = True
 
     def _load_cli_args(self, argv=None):
@@ -1019,7 +1072,14 @@ class Config:
                 self.sidecar_model = "qwen3:1.7b"
 
     def _query_installed_models(self):
-        """Query Ollama API for installed model names. Returns list or empty."""
+        """Query Ollama API for installed model names. Returns list or empty.
+
+        Successful answers are cached per host for _INSTALLED_MODELS_TTL
+        seconds; failures are not cached so a late-starting Ollama is seen.
+        """
+        cached = _INSTALLED_MODELS_CACHE.get(self.ollama_host)
+        if cached is not None and time.monotonic() - cached[0] < _INSTALLED_MODELS_TTL:
+            return list(cached[1])
         url = f"{self.ollama_host}/api/tags"
         try:
             resp = urllib.request.urlopen(url, timeout=3)
@@ -1027,9 +1087,12 @@ class Config:
                 data = json.loads(resp.read(10 * 1024 * 1024))
             finally:
                 resp.close()
-            return [m["name"].strip() for m in data.get("models", [])]
+            models = [m["name"].strip() for m in data.get("models", [])]
         except Exception:
             return []
+        if models:
+            _INSTALLED_MODELS_CACHE[self.ollama_host] = (time.monotonic(), tuple(models))
+        return models
 
     def _pick_best_model(self, installed, ram_gb):
         """Pick the best installed model that fits in RAM, using tier ranking."""
@@ -1077,8 +1140,12 @@ class Config:
                 return
 
     @classmethod
+    @functools.lru_cache(maxsize=256)
     def get_model_tier(cls, model_name):
-        """Get the tier label for a model. Returns (tier, min_ram) or (None, None)."""
+        """Get the tier label for a model. Returns (tier, min_ram) or (None, None).
+
+        Cached per (cls, model_name): MODEL_TIERS is fixed at class definition.
+        """
         for name, min_ram, tier in cls.MODEL_TIERS:
             if name in model_name or model_name.split(":")[0] == name.split(":")[0]:
                 return tier, min_ram
@@ -1151,10 +1218,18 @@ class Config:
                 pass
 
 
+@functools.lru_cache(maxsize=1)
 def _get_ram_gb():
-    """Detect system RAM in GB."""
+    """Detect system RAM in GB (cached: total RAM does not change at runtime)."""
     try:
-        if platform.system() == "Darwin":
+        system = platform.system()
+        if system in ("Linux", "Darwin"):
+            # Two sysconf calls; no /proc parsing or dylib loading
+            try:
+                return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 ** 3)
+            except (AttributeError, ValueError, OSError):
+                pass  # sysconf unavailable: fall through to the platform probes
+        if system == "Darwin":
             import ctypes
             libc = ctypes.CDLL("libSystem.B.dylib")
             mem = ctypes.c_int64()
@@ -1162,12 +1237,12 @@ def _get_ram_gb():
             # hw.memsize = 0x40000000 + 24
             libc.sysctlbyname(b"hw.memsize", ctypes.byref(mem), ctypes.byref(size), None, 0)
             return mem.value // (1024 ** 3)
-        elif platform.system() == "Linux":
+        elif system == "Linux":
             with open("/proc/meminfo", encoding="utf-8") as f:
                 for line in f:
                     if line.startswith("MemTotal:"):
                         return int(line.split()[1]) // (1024 * 1024)
-        elif platform.system() == "Windows":
+        elif system == "Windows":
             import ctypes
             class MEMORYSTATUSEX(ctypes.Structure):
                 _fields_ = [("dwLength", ctypes.c_ulong),
@@ -1223,6 +1298,16 @@ def _get_vram_gb():
 # System Prompt
 # ════════════════════════════════════════════════════════════════════════════════
 
+# Tool-call-like XML stripped from project instructions (prompt injection):
+# <invoke name=...>, Qwen <function=...>, and bare <Tool>...</Tool> tags.
+# One alternation, so the text is scanned once rather than once per form.
+_INSTRUCTION_TOOL_CALL_RE = re.compile(
+    r'<invoke\s+name="[^"]*"[^>]*>.*?</invoke>'
+    r'|<function=[^>]+>.*?</function>'
+    r'|<(Bash|Read|Write|Edit|Glob|Grep|WebFetch|WebSearch|NotebookEdit|SubAgent)\b[^>]*>.*?</\1>',
+    re.DOTALL)
+
+
 def _build_system_prompt(config):
     """Build system prompt with environment info and OS-specific hints."""
     cwd = config.cwd
@@ -1333,16 +1418,8 @@ IMPORTANT — This is Windows (NOT Linux/macOS):
     # Hierarchy: global (~/.config/vibe-local/CLAUDE.md) → parent dirs → cwd
     # Note: Do NOT load .claude/settings.json — it may contain API keys
     def _sanitize_instructions(content):
-        """Strip tool-call-like XML from project instructions to prevent prompt injection."""
-        safe = re.sub(r'<invoke\s+name="[^"]*"[^>]*>.*?</invoke>', '[BLOCKED]', content, flags=re.DOTALL)
-        safe = re.sub(r'<function=[^>]+>.*?</function>', '[BLOCKED]', safe, flags=re.DOTALL)
-        _tool_names = ["Bash", "Read", "Write", "Edit", "Glob", "Grep",
-                       "WebFetch", "WebSearch", "NotebookEdit", "SubAgent"]
-        for _tn in _tool_names:
-            safe = re.sub(
-                r'<%s\b[^>]*>.*?</%s>' % (re.escape(_tn), re.escape(_tn)),
-                '[BLOCKED]', safe, flags=re.DOTALL)
-        return safe
+        """Strip tool-call-like XML (<invoke>, <function=>, <Bash>...) to prevent prompt injection."""
+        return _INSTRUCTION_TOOL_CALL_RE.sub('[BLOCKED]', content)
 
     def _load_instructions(fpath, max_bytes=4000):
         """Load instructions file, returning (content, truncated_bool)."""
@@ -1401,6 +1478,74 @@ IMPORTANT — This is Windows (NOT Linux/macOS):
 # OllamaClient — Direct communication with Ollama OpenAI-compatible API
 # ════════════════════════════════════════════════════════════════════════════════
 
+_STDLIB_URLOPEN = urllib.request.urlopen  # to tell when urlopen has been swapped out
+
+
+class _TrackedHTTPResponse(http.client.HTTPResponse):
+    """HTTPResponse that remembers whether it was closed before the body ended.
+
+    Unread body bytes would be left on the socket, so such a connection must
+    not carry another request.
+    """
+    incomplete = False
+
+    def close(self):
+        if self.fp is not None:  # fp is dropped once the body is fully read
+            self.incomplete = True
+        super().close()
+
+
+def _keepalive_urlopen(local, req, timeout):
+    """urlopen() over a keep-alive connection cached on *local* (a threading.local).
+
+    Accepts a URL or urllib.request.Request and returns the response;
+    HTTP errors raise urllib.error.HTTPError exactly like urlopen, so
+    callers handle both the same way. Redirects are NOT followed. A
+    connection is reused only for the same scheme/host/port and only
+    after its previous response was read to the end.
+    """
+    if isinstance(req, str):
+        req = urllib.request.Request(req)
+    parsed = urllib.parse.urlsplit(req.full_url)
+    key = (parsed.scheme, parsed.hostname, parsed.port)
+    conn = getattr(local, "conn", None)
+    prev = getattr(local, "resp", None)
+    if conn is not None and (getattr(local, "key", None) != key or (
+            prev is not None and (prev.incomplete or not prev.isclosed()))):
+        conn.close()  # other host, or previous body not consumed: fresh socket
+        conn = None
+    if conn is None:
+        conn_cls = (http.client.HTTPSConnection if parsed.scheme == "https"
+                    else http.client.HTTPConnection)
+        conn = conn_cls(parsed.hostname, parsed.port, timeout=timeout)
+        conn.response_class = _TrackedHTTPResponse
+        local.conn, local.key = conn, key
+    headers = dict(req.header_items())
+    for attempt in range(2):
+        reused = conn.sock is not None
+        conn.timeout = timeout
+        if reused:
+            conn.sock.settimeout(timeout)
+        try:
+            conn.request(req.get_method(), req.selector, body=req.data, headers=headers)
+            resp = conn.getresponse()
+            break
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            # Idle keep-alive sockets may have been reaped server-side;
+            # retry once on a fresh connection, never a fresh one twice.
+            if attempt or not reused:
+                raise
+        except Exception:
+            conn.close()
+            raise
+    local.resp = resp
+    if resp.status >= 400:
+        raise urllib.error.HTTPError(req.full_url, resp.status, resp.reason,
+                                     resp.headers, resp)
+    return resp
+
+
 class OllamaClient:
     """Communicates with Ollama via /v1/chat/completions."""
 
@@ -1412,13 +1557,33 @@ class OllamaClient:
         self.debug = config.debug
         self.timeout = 300
         self._supports_tool_streaming = None  # None=untested, True/False=detected
+        self._conn_local = threading.local()  # per-thread keep-alive connection
+
+    def _use_urllib(self, url):
+        """True when a request must go through urllib.request.urlopen.
+
+        That is the case when urlopen has been replaced (e.g. patched by
+        tests) or when a proxy applies to the Ollama host: OLLAMA_HOST may
+        be remote, and the raw keep-alive connection ignores HTTP(S)_PROXY.
+        """
+        if urllib.request.urlopen is not _STDLIB_URLOPEN:
+            return True
+        parsed = urllib.parse.urlsplit(url)
+        return (parsed.scheme in urllib.request.getproxies()
+                and not urllib.request.proxy_bypass(parsed.hostname or ""))
+
+    def _urlopen(self, req, timeout):
+        """urlopen() over a keep-alive connection to Ollama (one per thread)."""
+        if self._use_urllib(req if isinstance(req, str) else req.full_url):
+            return urllib.request.urlopen(req, timeout=timeout)
+        return _keepalive_urlopen(self._conn_local, req, timeout)
 
     def check_connection(self, retries=3):
         """Check if Ollama is reachable. Returns (ok, model_list)."""
         url = f"{self.base_url}/api/tags"
         for attempt in range(retries):
             try:
-                resp = urllib.request.urlopen(url, timeout=5)
+                resp = self._urlopen(url, timeout=5)
                 try:
                     data = json.loads(resp.read(10 * 1024 * 1024))  # 10MB cap
                 finally:
@@ -1438,7 +1603,7 @@ class OllamaClient:
             return self._supports_tool_streaming
         try:
             url = f"{self.base_url}/api/version"
-            resp = urllib.request.urlopen(url, timeout=5)
+            resp = self._urlopen(url, timeout=5)
             try:
                 data = json.loads(resp.read(4096))
             finally:
@@ -1494,7 +1659,7 @@ class OllamaClient:
             method="POST",
         )
         try:
-            resp = urllib.request.urlopen(req, timeout=600)
+            resp = self._urlopen(req, timeout=600)
         except Exception as e:
             print(f"{C.RED}Failed to start pull: {e}{C.RESET}")
             return False
@@ -1655,7 +1820,7 @@ class OllamaClient:
                   f"stream={stream} num_ctx={self.context_window}{C.RESET}", file=sys.stderr)
 
         try:
-            resp = urllib.request.urlopen(req, timeout=self.timeout)
+            resp = self._urlopen(req, timeout=self.timeout)
         except urllib.error.HTTPError as e:
             error_body = ""
             try:
@@ -1706,7 +1871,7 @@ class OllamaClient:
         Each line is a complete JSON object.  Yields chunks converted to
         OpenAI delta format so stream_response() works without changes.
         """
-        buf = b""
+        buf = bytearray()  # grows in place; consumed lines are dropped once per chunk
         MAX_BUF = 1024 * 1024  # 1MB safety limit
         try:
             while True:
@@ -1722,16 +1887,23 @@ class OllamaClient:
                 if not chunk:
                     break
                 buf += chunk
-                if len(buf) > MAX_BUF and b"\n" not in buf:
-                    buf = b""  # discard oversized bufferless data
+                # Any earlier newline was already consumed, so only the new
+                # chunk needs scanning
+                if len(buf) > MAX_BUF and chunk.find(b"\n") == -1:
+                    buf.clear()  # discard oversized bufferless data
                     continue
-                while b"\n" in buf:
-                    line_bytes, buf = buf.split(b"\n", 1)
-                    line = line_bytes.decode("utf-8", errors="replace").strip()
+                start = 0
+                while True:
+                    nl = buf.find(b"\n", start)
+                    if nl == -1:
+                        del buf[:start]
+                        break
+                    line = buf[start:nl].decode("utf-8", errors="replace").strip()
+                    start = nl + 1
                     if not line:
                         continue
                     try:
-                        data = json.loads(line)
+                        data = _json_loads_line(line)
                     except json.JSONDecodeError:
                         continue
 
@@ -1789,7 +1961,7 @@ class OllamaClient:
                 headers={"Content-Type": "application/json"},
                 method="POST",
             )
-            resp = urllib.request.urlopen(req, timeout=5)
+            resp = self._urlopen(req, timeout=5)
             try:
                 data = json.loads(resp.read(10 * 1024 * 1024))  # 10MB cap
             finally:
@@ -2226,39 +2398,76 @@ class BashTool(Tool):
         "required": ["command"],
     }
 
-    def _build_clean_env(self):
-        """Build sanitized environment dict, stripping secrets."""
-        _ALWAYS_ALLOW = {
-            "PATH", "HOME", "USER", "LOGNAME", "SHELL", "TERM", "LANG",
-            "LC_ALL", "LC_CTYPE", "LC_MESSAGES", "TMPDIR", "TMP", "TEMP",
-            "DISPLAY", "WAYLAND_DISPLAY", "XDG_RUNTIME_DIR", "XDG_DATA_HOME",
-            "XDG_CONFIG_HOME", "XDG_CACHE_HOME", "SSH_AUTH_SOCK",
-            "EDITOR", "VISUAL", "PAGER", "HOSTNAME", "PWD", "OLDPWD", "SHLVL",
-            "COLORTERM", "TERM_PROGRAM", "COLUMNS", "LINES", "NO_COLOR",
-            "FORCE_COLOR", "CC", "CXX", "CFLAGS", "LDFLAGS", "PKG_CONFIG_PATH",
-            "GOPATH", "GOROOT", "CARGO_HOME", "RUSTUP_HOME", "JAVA_HOME",
-            "NVM_DIR", "PYENV_ROOT", "VIRTUAL_ENV", "CONDA_DEFAULT_ENV",
-            "OLLAMA_HOST", "PYTHONPATH", "NODE_PATH", "GEM_HOME", "RBENV_ROOT",
-        }
-        _SENSITIVE_PREFIXES = ("CLAUDECODE", "CLAUDE_CODE", "ANTHROPIC",
+    # Security patterns, each list folded into one alternation compiled at
+    # class creation so a command is scanned once per category, not per rule
+    _BG_PATTERNS_RE = re.compile("|".join(f"(?:{p})" for p in (
+        r'&\s*$',               # trailing &
+        r'&\s*\)',              # & before closing paren
+        r'&\s*;',              # & before semicolon
+        r'\bnohup\b',          # nohup
+        r'\bsetsid\b',         # setsid
+        r'\bdisown\b',         # disown
+        r'\bscreen\s+-[dDm]',  # detached screen
+        r'\btmux\b.*\b(new|send)',  # tmux new/send
+        r'\bat\s+now\b',       # at scheduler
+        r"bash\s+-c\s+['\"].*&",  # bash -c with background
+        r"sh\s+-c\s+['\"].*&",    # sh -c with background
+    )))
+    _DANGEROUS_PATTERNS_RE = re.compile("|".join(f"(?:{p})" for p in (
+        r'\bcurl\b.*\|\s*\bsh\b',       # curl pipe to shell
+        r'\bwget\b.*\|\s*\bsh\b',       # wget pipe to shell
+        r'\brm\s+-rf\s+/',              # rm -rf from root
+        r'\bmkfs\b',                     # format filesystem
+        r'\bdd\b.*\bof=/dev/',          # dd to device
+        r'>\s*/etc/',                    # overwrite system files
+        r'\beval\b.*\bbase64\b',        # eval with base64 decode
+    )), re.IGNORECASE)
+    # Permission/config files the shell must not write to
+    _PROTECTED_NAME_RE = re.compile(r"permissions\.json|\.vibe-coder\.json|config\.json")
+    _WRITE_INDICATORS = (">", ">>", "tee ", "mv ", "cp ", "echo ", "cat ",
+                         "sed ", "dd ", "install ", "printf ", "perl ",
+                         "python", "ruby ", "bash -c", "sh -c", "ln ")
+
+    # Environment filtering for child shells
+    _ENV_ALWAYS_ALLOW = frozenset({
+        "PATH", "HOME", "USER", "LOGNAME", "SHELL", "TERM", "LANG",
+        "LC_ALL", "LC_CTYPE", "LC_MESSAGES", "TMPDIR", "TMP", "TEMP",
+        "DISPLAY", "WAYLAND_DISPLAY", "XDG_RUNTIME_DIR", "XDG_DATA_HOME",
+        "XDG_CONFIG_HOME", "XDG_CACHE_HOME", "SSH_AUTH_SOCK",
+        "EDITOR", "VISUAL", "PAGER", "HOSTNAME", "PWD", "OLDPWD", "SHLVL",
+        "COLORTERM", "TERM_PROGRAM", "COLUMNS", "LINES", "NO_COLOR",
+        "FORCE_COLOR", "CC", "CXX", "CFLAGS", "LDFLAGS", "PKG_CONFIG_PATH",
+        "GOPATH", "GOROOT", "CARGO_HOME", "RUSTUP_HOME", "JAVA_HOME",
+        "NVM_DIR", "PYENV_ROOT", "VIRTUAL_ENV", "CONDA_DEFAULT_ENV",
+        "OLLAMA_HOST", "PYTHONPATH", "NODE_PATH", "GEM_HOME", "RBENV_ROOT",
+    })
+    _ENV_SENSITIVE_PREFIXES = ("CLAUDECODE", "CLAUDE_CODE", "ANTHROPIC",
                                "OPENAI", "AWS_SECRET", "AWS_SESSION",
                                "GITHUB_TOKEN", "GH_TOKEN", "GITLAB_",
                                "HF_TOKEN", "AZURE_")
-        _SENSITIVE_SUBSTRINGS = ("_SECRET", "_TOKEN", "_KEY", "_PASSWORD",
+    _ENV_SENSITIVE_SUBSTRINGS = ("_SECRET", "_TOKEN", "_KEY", "_PASSWORD",
                                  "_CREDENTIAL", "_API_KEY", "DATABASE_URL",
                                  "REDIS_URL", "MONGO_URI", "PRIVATE_KEY",
                                  "_AUTH", "KUBECONFIG")
-        clean_env = {}
-        for k, v in os.environ.items():
-            if k in _ALWAYS_ALLOW:
-                clean_env[k] = v
-                continue
-            k_upper = k.upper()
-            if k_upper.startswith(_SENSITIVE_PREFIXES):
-                continue
-            if any(sub in k_upper for sub in _SENSITIVE_SUBSTRINGS):
-                continue
-            clean_env[k] = v
+    _ENV_SENSITIVE_RE = re.compile("|".join(map(re.escape, _ENV_SENSITIVE_SUBSTRINGS)))
+    _env_name_allowed = {}  # var name -> verdict; depends on the name only
+
+    @classmethod
+    def _env_allowed(cls, name):
+        """Whether env var *name* may be passed to child processes (memoized)."""
+        allowed = cls._env_name_allowed.get(name)
+        if allowed is None:
+            upper = name.upper()
+            allowed = name in cls._ENV_ALWAYS_ALLOW or not (
+                upper.startswith(cls._ENV_SENSITIVE_PREFIXES)
+                or cls._ENV_SENSITIVE_RE.search(upper))
+            cls._env_name_allowed[name] = allowed
+        return allowed
+
+    def _build_clean_env(self):
+        """Build sanitized environment dict, stripping secrets."""
+        allowed = self._env_allowed
+        clean_env = {k: v for k, v in os.environ.items() if allowed(k)}
         if "PATH" not in clean_env:
             if os.name == "nt":
                 clean_env["PATH"] = os.environ.get("PATH", "")
@@ -2307,48 +2516,20 @@ class BashTool(Tool):
         # --- Security checks (apply to BOTH foreground and background) ---
 
         # Detect background/async commands (comprehensive patterns)
-        _BG_PATTERNS = [
-            r'&\s*$',               # trailing &
-            r'&\s*\)',              # & before closing paren
-            r'&\s*;',              # & before semicolon
-            r'\bnohup\b',          # nohup
-            r'\bsetsid\b',         # setsid
-            r'\bdisown\b',         # disown
-            r'\bscreen\s+-[dDm]',  # detached screen
-            r'\btmux\b.*\b(new|send)',  # tmux new/send
-            r'\bat\s+now\b',       # at scheduler
-            r"bash\s+-c\s+['\"].*&",  # bash -c with background
-            r"sh\s+-c\s+['\"].*&",    # sh -c with background
-        ]
-        for pat in _BG_PATTERNS:
-            if re.search(pat, command):
-                return ("Error: background/async commands are not supported in this environment. "
-                        "Commands must complete and return output. Remove async patterns and try again.")
+        if self._BG_PATTERNS_RE.search(command):
+            return ("Error: background/async commands are not supported in this environment. "
+                    "Commands must complete and return output. Remove async patterns and try again.")
 
         # Block dangerous commands (defense-in-depth, even in -y mode)
-        _DANGEROUS_PATTERNS = [
-            r'\bcurl\b.*\|\s*\bsh\b',       # curl pipe to shell
-            r'\bwget\b.*\|\s*\bsh\b',       # wget pipe to shell
-            r'\brm\s+-rf\s+/',              # rm -rf from root
-            r'\bmkfs\b',                     # format filesystem
-            r'\bdd\b.*\bof=/dev/',          # dd to device
-            r'>\s*/etc/',                    # overwrite system files
-            r'\beval\b.*\bbase64\b',        # eval with base64 decode
-        ]
-        for pat in _DANGEROUS_PATTERNS:
-            if re.search(pat, command, re.IGNORECASE):
-                return ("Error: this command pattern is blocked for safety. "
-                        "If you need to run this, do it manually outside vibe-coder.")
+        if self._DANGEROUS_PATTERNS_RE.search(command):
+            return ("Error: this command pattern is blocked for safety. "
+                    "If you need to run this, do it manually outside vibe-coder.")
 
         # Block commands that could tamper with permission/config files
-        _PROTECTED_BASENAMES = {"permissions.json", ".vibe-coder.json", "config.json"}
-        _WRITE_INDICATORS = (">", ">>", "tee ", "mv ", "cp ", "echo ", "cat ",
-                             "sed ", "dd ", "install ", "printf ", "perl ",
-                             "python", "ruby ", "bash -c", "sh -c", "ln ")
         cmd_lower = command.lower()
-        for ppath in _PROTECTED_BASENAMES:
-            if ppath in cmd_lower and any(w in cmd_lower for w in _WRITE_INDICATORS):
-                return f"Error: writing to {ppath} via shell is blocked for security. Use the config system instead."
+        m = self._PROTECTED_NAME_RE.search(cmd_lower)
+        if m and any(w in cmd_lower for w in self._WRITE_INDICATORS):
+            return f"Error: writing to {m.group()} via shell is blocked for security. Use the config system instead."
 
         # --- End security checks ---
 
@@ -2523,17 +2704,21 @@ class ReadTool(Tool):
         if not os.path.isabs(file_path):
             file_path = os.path.join(os.getcwd(), file_path)
 
-        # Resolve symlinks to detect escapes
+        # One lstat answers exists / is-dir / size for the common case; only a
+        # symlink is resolved (and re-stat'ed), so extension-based handling
+        # below goes by the link's target
         try:
-            real_path = os.path.realpath(file_path)
-        except (OSError, ValueError):
+            st = os.lstat(file_path)
+            if stat.S_ISLNK(st.st_mode):
+                file_path = os.path.realpath(file_path)
+                st = os.stat(file_path)
+        except ValueError:
             return f"Error: cannot resolve path: {file_path}"
-        if not os.path.exists(real_path):
+        except OSError:
             return f"Error: file not found: {file_path}"
-        if os.path.isdir(real_path):
+        if stat.S_ISDIR(st.st_mode):
             return f"Error: {file_path} is a directory, not a file"
-        # Use resolved path for actual reading
-        file_path = real_path
+        file_size = st.st_size
 
         # Detect file extension for special handling
         _, ext = os.path.splitext(file_path)
@@ -2546,9 +2731,8 @@ class ReadTool(Tool):
         # Jupyter notebook reading — parse and format cells with outputs
         if ext_lower == ".ipynb":
             try:
-                nb_size = os.path.getsize(file_path)
-                if nb_size > 50_000_000:  # 50MB
-                    return f"Error: notebook too large ({nb_size // 1_000_000}MB). Max 50MB."
+                if file_size > 50_000_000:  # 50MB
+                    return f"Error: notebook too large ({file_size // 1_000_000}MB). Max 50MB."
                 with open(file_path, "r", encoding="utf-8") as f:
                     nb = json.load(f)
                 cells = nb.get("cells", [])
@@ -2578,10 +2762,6 @@ class ReadTool(Tool):
 
         # Image file handling — read as base64 for multimodal models
         if ext_lower in IMAGE_EXTENSIONS:
-            try:
-                file_size = os.path.getsize(file_path)
-            except OSError as e:
-                return f"Error: cannot determine file size: {e}"
             if file_size > IMAGE_MAX_SIZE:
                 return f"Error: image too large ({file_size // 1_000_000}MB). Max 10MB for images."
             if file_size == 0:
@@ -2599,22 +2779,8 @@ class ReadTool(Tool):
                 return f"Error reading image file: {e}"
 
         # Check file size (100MB limit)
-        try:
-            file_size = os.path.getsize(file_path)
-            if file_size > 100_000_000:
-                return f"Error: file too large ({file_size // 1_000_000}MB). Max 100MB."
-        except OSError as e:
-            return f"Error: cannot determine file size: {e}"
-
-        # Check for binary files
-        try:
-            with open(file_path, "rb") as f:
-                sample = f.read(8192)
-                if b"\x00" in sample:
-                    size = os.path.getsize(file_path)
-                    return f"(binary file, {size} bytes)"
-        except Exception as e:
-            return f"Error reading file: {e}"
+        if file_size > 100_000_000:
+            return f"Error: file too large ({file_size // 1_000_000}MB). Max 100MB."
 
         try:
             from itertools import islice
@@ -2622,7 +2788,13 @@ class ReadTool(Tool):
             start = max(0, offset - 1)
             output_parts = []
             total_lines = None
-            with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            # One open serves both the binary probe and the text read
+            raw = open(file_path, "rb")
+            with io.TextIOWrapper(raw, encoding="utf-8", errors="replace") as f:
+                # Check for binary files (only the first 8KB is ever loaded)
+                if b"\x00" in raw.read(8192):
+                    return f"(binary file, {file_size} bytes)"
+                raw.seek(0)
                 for i, line in enumerate(islice(f, start, start + limit)):
                     lineno = start + i
                     # Truncate very long lines
@@ -2730,18 +2902,90 @@ class ReadTool(Tool):
         return result
 
 
+def _atomic_write_text(path, text, suffix=".vibe_tmp"):
+    """Atomically replace path with text (UTF-8, mode 0600).
+
+    On Linux the data is written to an anonymous O_TMPFILE inode in the
+    target directory, so a crash mid-write leaves no stray temp file; the
+    inode only gets a (random) name right before the final rename. Where
+    O_TMPFILE is unavailable or unsupported by the filesystem, falls back
+    to mkstemp + os.replace.
+    """
+    dirname = os.path.dirname(path) or "."
+    o_tmpfile = getattr(os, "O_TMPFILE", 0)
+    if o_tmpfile:
+        try:
+            fd = os.open(dirname, o_tmpfile | os.O_WRONLY, 0o600)
+        except OSError:
+            fd = -1  # e.g. EOPNOTSUPP/EISDIR: filesystem lacks support
+        if fd >= 0:
+            tmp_path = None
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(text.encode("utf-8"))
+                    f.flush()
+                    tmp_path = os.path.join(dirname, f".{uuid.uuid4().hex}{suffix}")
+                    # linkat(AT_SYMLINK_FOLLOW) through /proc names the open inode
+                    os.link(f"/proc/self/fd/{f.fileno()}", tmp_path, follow_symlinks=True)
+                os.replace(tmp_path, path)
+                return
+            except OSError:
+                # No /proc or linkat refused: nothing reached the target
+                # yet, so retry the portable way below
+                if tmp_path is not None:
+                    try:
+                        os.unlink(tmp_path)
+                    except OSError:
+                        pass
+    # Atomic write: mkstemp + rename (crash-safe, no predictable name)
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix=suffix)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+_PROTECTED_BASENAMES = frozenset({"permissions.json", ".vibe-coder.json"})
+_protected_dir_cache = {}  # config dir path -> its realpath, once it exists
+
+
+def _protected_config_dirs():
+    """Resolved vibe-local and legacy vibe-coder config directories.
+
+    Resolutions are memoized per path once the directory exists; a missing
+    one is re-resolved on every call so a later symlinked creation counts.
+    Keyed by path, so a changed HOME is picked up.
+    """
+    home = os.path.expanduser("~")
+    dirs = []
+    for dirname in ("vibe-local", "vibe-coder"):
+        config_dir = os.path.join(home, ".config", dirname)
+        real_config_dir = _protected_dir_cache.get(config_dir)
+        if real_config_dir is None:
+            real_config_dir = os.path.realpath(config_dir)
+            if os.path.isdir(real_config_dir):
+                _protected_dir_cache[config_dir] = real_config_dir
+        dirs.append(real_config_dir)
+    return dirs
+
+
 def _is_protected_path(file_path):
     """Check if a file path points to a protected config/permission file."""
-    _PROTECTED_BASENAMES = {"permissions.json", ".vibe-coder.json"}
+    # The target itself is resolved on every call: a cached answer could be
+    # bypassed by re-pointing a symlink between checks.
     try:
         real = os.path.realpath(file_path)
         basename = os.path.basename(real)
         if basename in _PROTECTED_BASENAMES:
             return True
         # Check both vibe-local and legacy vibe-coder config directories
-        for dirname in ("vibe-local", "vibe-coder"):
-            config_dir = os.path.join(os.path.expanduser("~"), ".config", dirname)
-            real_config_dir = os.path.realpath(config_dir)
+        for real_config_dir in _protected_config_dirs():
             if real.startswith(real_config_dir + os.sep) or real == real_config_dir:
                 return True
     except (OSError, ValueError):
@@ -2769,7 +3013,8 @@ class WriteTool(Tool):
 
     MAX_WRITE_SIZE = 10 * 1024 * 1024  # 10MB write size limit
 
-    def execute(self, params):
+    def execute(self, params, cwd=None):
+        """Relative file paths resolve against cwd (default: os.getcwd())."""
         file_path = params.get("file_path", "")
         content = params.get("content", "")
 
@@ -2779,22 +3024,25 @@ class WriteTool(Tool):
             return (f"Error: content too large ({len(content) // 1_000_000}MB). "
                     f"Max write size is {self.MAX_WRITE_SIZE // (1024*1024)}MB. Split into smaller writes.")
         if not os.path.isabs(file_path):
-            file_path = os.path.join(os.getcwd(), file_path)
+            file_path = os.path.join(cwd or os.getcwd(), file_path)
 
-        # Resolve symlinks to prevent symlink-based attacks
-        # Check islink() BEFORE exists() — dangling symlinks return False for exists()
+        # Refuse symlinks: lstat the path itself (a dangling link still has an
+        # lstat entry). The same call tells whether a file already exists.
+        try:
+            st = os.lstat(file_path)
+        except ValueError:
+            return f"Error: cannot resolve path: {file_path}"
+        except OSError:
+            st = None  # new file (an unreachable parent surfaces on write)
+        if st is not None and stat.S_ISLNK(st.st_mode):
+            return f"Error: refusing to write through symlink: {file_path}"
+        # Resolve symlinked parent dirs so the protection check and the
+        # report see the real location
         try:
-            if os.path.islink(file_path):
-                return f"Error: refusing to write through symlink: {file_path}"
-            # For new files: resolve parent dir to prevent symlink escape
             resolved = os.path.realpath(file_path)
-            if os.path.exists(file_path):
-                file_path = resolved
-            else:
-                # New file: ensure resolved parent matches expected parent
-                file_path = resolved
         except (OSError, ValueError):
             return f"Error: cannot resolve path: {file_path}"
+        file_path = resolved
 
         # Block writes to protected config/permission files
         if _is_protected_path(file_path):
@@ -2803,7 +3051,7 @@ class WriteTool(Tool):
         tmp_path = None
         try:
             # Backup for /undo — use separate variable to preserve new content
-            if os.path.exists(file_path):
+            if st is not None:
                 try:
                     with open(file_path, "r", encoding="utf-8", errors="replace") as uf:
                         old_content = uf.read(1_048_576 + 1)  # 1MB + 1 to detect overflow
@@ -2816,18 +3064,7 @@ class WriteTool(Tool):
             dirname = os.path.dirname(file_path)
             if dirname:
                 os.makedirs(dirname, exist_ok=True)
-            # Atomic write: mkstemp + rename (crash-safe, no predictable name)
-            fd, tmp_path = tempfile.mkstemp(dir=dirname or ".", suffix=".vibe_tmp")
-            try:
-                with os.fdopen(fd, "w", encoding="utf-8") as f:
-                    f.write(content)
-                os.replace(tmp_path, file_path)
-            except Exception:
-                try:
-                    os.unlink(tmp_path)
-                except OSError:
-                    pass
-                raise
+            _atomic_write_text(file_path, content)
             lines = content.count("\n") + (1 if content and not content.endswith("\n") else 0)
             return f"Wrote {len(content)} bytes ({lines} lines) to {file_path}"
         except Exception as e:
@@ -2896,25 +3133,19 @@ class EditTool(Tool):
         if _is_protected_path(file_path):
             return f"Error: editing {os.path.basename(file_path)} is blocked for security. Use the config system instead."
 
-        # File size guard — prevent OOM on huge files
+        # One open serves the size guard, the binary probe and the read
         try:
-            file_size = os.path.getsize(file_path)
-            if file_size > 50 * 1024 * 1024:  # 50MB
-                return f"Error: file too large for editing ({file_size // 1_000_000}MB). Max 50MB."
-        except OSError:
-            pass
-
-        # Detect binary files before editing (prevent corruption)
-        try:
-            with open(file_path, "rb") as bf:
-                sample = bf.read(8192)
-                if b"\x00" in sample:
+            bf = open(file_path, "rb")
+            with io.TextIOWrapper(bf, encoding="utf-8", errors="replace") as f:
+                # File size guard — prevent OOM on huge files
+                file_size = os.fstat(bf.fileno()).st_size
+                if file_size > 50 * 1024 * 1024:  # 50MB
+                    return f"Error: file too large for editing ({file_size // 1_000_000}MB). Max 50MB."
+                # Detect binary files before editing (prevent corruption);
+                # only the first 8KB is loaded for the check
+                if b"\x00" in bf.read(8192):
                     return f"Error: {file_path} appears to be a binary file — editing refused."
-        except OSError:
-            pass
-
-        try:
-            with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+                bf.seek(0)
                 content = f.read()
         except Exception as e:
             return f"Error reading file: {e}"
@@ -2924,9 +3155,12 @@ class EditTool(Tool):
         count = content.count(old_string)
         if count == 0:
             # Fallback: normalize Unicode (NFC) for reliable matching (macOS uses NFD)
+            # normalize() hands back the same object when the text is already
+            # NFC (no copy); if neither side changed, the raw miss stands
             norm_content = unicodedata.normalize("NFC", content)
             norm_old = unicodedata.normalize("NFC", old_string)
-            count = norm_content.count(norm_old)
+            if norm_content is not content or norm_old is not old_string:
+                count = norm_content.count(norm_old)
             if count == 0:
                 return "Error: old_string not found in file. Read the file first to verify exact content, including whitespace and indentation."
             used_normalized = True
@@ -2955,19 +3189,7 @@ class EditTool(Tool):
             pass
 
         try:
-            # Atomic write: mkstemp + rename (crash-safe, no predictable name)
-            dirname = os.path.dirname(file_path)
-            fd, tmp_path = tempfile.mkstemp(dir=dirname or ".", suffix=".vibe_tmp")
-            try:
-                with os.fdopen(fd, "w", encoding="utf-8") as f:
-                    f.write(new_content)
-                os.replace(tmp_path, file_path)
-            except Exception:
-                try:
-                    os.unlink(tmp_path)
-                except OSError:
-                    pass
-                raise
+            _atomic_write_text(file_path, new_content)
             # Generate compact diff for display
             diff_lines = []
             old_lines = content.splitlines(keepends=True)
@@ -3026,6 +3248,53 @@ class GlobTool(Tool):
 
     MAX_RESULTS = 200  # bounded result set to prevent memory blowup
 
+    def _walk_files(self, base):
+        """Yield (DirEntry, path relative to base) for every non-directory under base.
+
+        Same traversal as os.walk(base, followlinks=False) with SKIP_DIRS pruned
+        (top-down, scandir order, unreadable dirs skipped), but hands back the
+        DirEntry itself so callers reuse its cached type and stat data instead
+        of re-stat'ing joined paths.
+        """
+        seen_dirs = set()  # (st_dev, st_ino) of visited dirs: prevent bind-mount loops
+        try:
+            st = os.stat(base)
+            base_id = (st.st_dev, st.st_ino)
+        except OSError:
+            base_id = None
+        stack = [(base, "", base_id)]
+        while stack:
+            top, rel_top, dir_id = stack.pop()
+            if dir_id is not None:
+                if dir_id in seen_dirs:
+                    continue
+                seen_dirs.add(dir_id)
+            try:
+                with os.scandir(top) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            subdirs = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                rel = os.path.join(rel_top, entry.name) if rel_top else entry.name
+                if not is_dir:
+                    yield entry, rel
+                elif entry.name not in self.SKIP_DIRS:
+                    try:
+                        if entry.is_symlink():
+                            continue  # listed like os.walk does, but never entered
+                        st = entry.stat(follow_symlinks=False)
+                        dir_id = (st.st_dev, st.st_ino)
+                    except OSError:
+                        dir_id = None
+                    subdirs.append((entry.path, rel, dir_id))
+            # Reversed so the stack pops them in scandir order (pre-order, like os.walk)
+            stack.extend(reversed(subdirs))
+
     def execute(self, params):
         import heapq
         pattern = params.get("pattern", "")
@@ -3045,12 +3314,27 @@ class GlobTool(Tool):
             try:
                 base_path = Path(base)
                 real_base = base_path.resolve()
+                real_parents = {}  # parent dir -> resolved parent (resolved once per dir)
                 for full_path in base_path.glob(pattern):
-                    if not full_path.is_file():
+                    # One stat gives both the file check and the mtime
+                    try:
+                        st = full_path.stat()
+                    except (OSError, ValueError):
+                        continue
+                    if not stat.S_ISREG(st.st_mode):
                         continue
-                    # Verify resolved path stays within base (prevents symlink escape)
+                    # Verify resolved path stays within base (prevents symlink escape).
+                    # Unless the entry itself is a link, it resolves to its
+                    # resolved parent plus its own name.
                     try:
-                        resolved = full_path.resolve()
+                        if full_path.is_symlink() or full_path.name in ("", ".", ".."):
+                            resolved = full_path.resolve()
+                        else:
+                            parent = full_path.parent
+                            real_parent = real_parents.get(parent)
+                            if real_parent is None:
+                                real_parent = real_parents[parent] = parent.resolve()
+                            resolved = real_parent / full_path.name
                         if not str(resolved).startswith(str(real_base) + os.sep) and resolved != real_base:
                             continue
                     except (OSError, ValueError):
@@ -3058,10 +3342,7 @@ class GlobTool(Tool):
                     parts = full_path.relative_to(base_path).parts
                     if any(p in self.SKIP_DIRS for p in parts):
                         continue
-                    try:
-                        mtime = full_path.stat().st_mtime
-                    except OSError:
-                        mtime = 0
+                    mtime = st.st_mtime
                     total_found += 1
                     if len(heap) < self.MAX_RESULTS:
                         heapq.heappush(heap, (mtime, str(full_path)))
@@ -3070,32 +3351,21 @@ class GlobTool(Tool):
             except Exception:
                 pass
         else:
-            # Use os.walk with early dir pruning (fast, skips node_modules/.git early)
-            seen_dirs = set()  # prevent symlink loops
+            # fnmatch.fnmatch(name, pattern) without the per-call normcase work
+            match = re.compile(fnmatch.translate(os.path.normcase(pattern))).match
+            normcase = os.path.normcase
             try:
-                for root, dirs, files in os.walk(base, followlinks=False):
-                    try:
-                        real_root = os.path.realpath(root)
-                        if real_root in seen_dirs:
-                            dirs[:] = []
-                            continue
-                        seen_dirs.add(real_root)
-                    except OSError:
-                        pass
-                    dirs[:] = [d for d in dirs if d not in self.SKIP_DIRS]
-                    for name in files:
-                        full = os.path.join(root, name)
-                        rel = os.path.relpath(full, base)
-                        if fnmatch.fnmatch(rel, pattern) or fnmatch.fnmatch(name, pattern):
-                            try:
-                                mtime = os.path.getmtime(full)
-                            except OSError:
-                                mtime = 0
-                            total_found += 1
-                            if len(heap) < self.MAX_RESULTS:
-                                heapq.heappush(heap, (mtime, full))
-                            elif mtime > heap[0][0]:
-                                heapq.heapreplace(heap, (mtime, full))
+                for entry, rel in self._walk_files(base):
+                    if match(normcase(rel)) or match(normcase(entry.name)):
+                        try:
+                            mtime = entry.stat().st_mtime  # cached on the entry (free on Windows)
+                        except OSError:
+                            mtime = 0
+                        total_found += 1
+                        if len(heap) < self.MAX_RESULTS:
+                            heapq.heappush(heap, (mtime, entry.path))
+                        elif mtime > heap[0][0]:
+                            heapq.heapreplace(heap, (mtime, entry.path))
             except PermissionError:
                 pass
 
@@ -3155,6 +3425,8 @@ class GrepTool(Tool):
                    ".woff", ".woff2", ".ttf", ".eot", ".mp3", ".mp4",
                    ".mov", ".avi", ".wmv", ".flv", ".wav", ".ogg",
                    ".db", ".sqlite", ".wasm", ".pkl", ".npy", ".parquet", ".bin"}
+    # Nested quantifiers such as (a+)+ (ReDoS), compiled once for all calls
+    _REDOS_RE = re.compile(r'(\([^)]*[+*][^)]*\))[+*]')
 
     def execute(self, params):
         pat_str = params.get("pattern", "")
@@ -3188,8 +3460,7 @@ class GrepTool(Tool):
         # ReDoS protection: limit pattern length and reject nested quantifiers
         if len(pat_str) > 500:
             return "Error: regex pattern too long (max 500 chars)"
-        _REDOS_RE = re.compile(r'(\([^)]*[+*][^)]*\))[+*]')
-        if _REDOS_RE.search(pat_str):
+        if self._REDOS_RE.search(pat_str):
             return "Error: regex pattern contains nested quantifiers (potential ReDoS)"
         if not os.path.isabs(search_path):
             search_path = os.path.join(os.getcwd(), search_path)
@@ -3204,42 +3475,47 @@ class GrepTool(Tool):
         file_counts = {}
 
         MAX_GREP_FILE_SIZE = 50 * 1024 * 1024  # 50MB — skip very large files
+        # fnmatch.fnmatch(basename, glob_filter) without per-file normcase work
+        glob_match = (re.compile(fnmatch.translate(os.path.normcase(glob_filter))).match
+                      if glob_filter else None)
 
         def search_file(filepath):
             _, ext = os.path.splitext(filepath)
             if ext.lower() in self.BINARY_EXTS:
                 return
-            if glob_filter and not fnmatch.fnmatch(os.path.basename(filepath), glob_filter):
+            if glob_match and not glob_match(os.path.normcase(os.path.basename(filepath))):
                 return
-            # Skip very large files to avoid performance issues
+            # One open per file: size check, binary probe and the search
+            # itself all go through the same descriptor
             try:
-                if os.path.getsize(filepath) > MAX_GREP_FILE_SIZE:
-                    return
+                f = open(filepath, "rb")
             except OSError:
                 return
-            # Binary probe: check for null bytes in first 8KB (same pattern as ReadTool)
-            try:
-                with open(filepath, "rb") as bf:
-                    sample = bf.read(8192)
-                    if b'\x00' in sample:
+            # The wrapper decodes lazily, so the raw probe below reads from
+            # offset 0 untouched; closing it closes f
+            with io.TextIOWrapper(f, encoding="utf-8", errors="replace") as text:
+                try:
+                    # Skip very large files to avoid performance issues
+                    if os.fstat(f.fileno()).st_size > MAX_GREP_FILE_SIZE:
+                        return
+                    # Binary probe: check for null bytes in first 8KB (same pattern as ReadTool)
+                    if b'\x00' in f.read(8192):
                         return  # binary file, skip
-            except OSError:
-                return
-            try:
-                # Use streaming read with rolling buffer for context lines
-                # Avoids loading entire file into memory (fix for large files)
-                with open(filepath, "r", encoding="utf-8", errors="replace") as f:
-                    if before or after:
-                        # Need context: read into list but cap at 100K lines
-                        lines = []
-                        for i, l in enumerate(f):
-                            lines.append(l)
-                            if i >= 100_000:
-                                break
-                    else:
-                        lines = None  # stream mode
-            except (OSError, UnicodeDecodeError):
-                return
+                    f.seek(0)
+                    _search_text(filepath, text)
+                except (OSError, UnicodeDecodeError):
+                    return
+
+        def _search_text(filepath, f):
+            if before or after:
+                # Need context: read into list but cap at 100K lines
+                lines = []
+                for i, l in enumerate(f):
+                    lines.append(l)
+                    if i >= 100_000:
+                        break
+            else:
+                lines = None  # stream mode
 
             if lines is not None:
                 # Context mode (with -A/-B/-C)
@@ -3262,22 +3538,18 @@ class GrepTool(Tool):
                             results.append("--")
             else:
                 # Streaming mode (no context needed) — memory efficient
-                try:
-                    with open(filepath, "r", encoding="utf-8", errors="replace") as f:
-                        for lineno, line in enumerate(f, 1):
-                            if pattern.search(line):
-                                if output_mode == "files_with_matches":
-                                    if filepath not in file_counts:
-                                        file_counts[filepath] = 0
-                                        results.append(filepath)
-                                    file_counts[filepath] += 1
-                                    return
-                                elif output_mode == "count":
-                                    file_counts[filepath] = file_counts.get(filepath, 0) + 1
-                                else:
-                                    results.append(f"{filepath}:{lineno}:{line.rstrip()}")
-                except (OSError, UnicodeDecodeError):
-                    return
+                for lineno, line in enumerate(f, 1):
+                    if pattern.search(line):
+                        if output_mode == "files_with_matches":
+                            if filepath not in file_counts:
+                                file_counts[filepath] = 0
+                                results.append(filepath)
+                            file_counts[filepath] += 1
+                            return
+                        elif output_mode == "count":
+                            file_counts[filepath] = file_counts.get(filepath, 0) + 1
+                        else:
+                            results.append(f"{filepath}:{lineno}:{line.rstrip()}")
 
         if os.path.isfile(search_path):
             search_file(search_path)
@@ -3308,6 +3580,27 @@ class GrepTool(Tool):
         return "\n".join(results[:head_limit])
 
 
+def _html_to_text_impl(html):
+    """Simple HTML tag removal."""
+    # Remove script and style
+    html = re.sub(r"<script[^>]*>.*?</script>", "", html, flags=re.DOTALL)
+    html = re.sub(r"<style[^>]*>.*?</style>", "", html, flags=re.DOTALL)
+    # Remove tags
+    html = re.sub(r"<[^>]+>", " ", html)
+    # Decode entities
+    html = html_module.unescape(html)
+    # Collapse whitespace
+    html = re.sub(r"\s+", " ", html)
+    html = re.sub(r"\n\s*\n+", "\n\n", html)
+    return html.strip()
+
+
+# The agent often re-fetches the same page within a session; keep the last
+# few conversions. Larger inputs bypass the cache so it stays small.
+_HTML_TEXT_CACHE_MAX = 1_000_000
+_html_to_text_cached = functools.lru_cache(maxsize=32)(_html_to_text_impl)
+
+
 class WebFetchTool(Tool):
     name = "WebFetch"
     description = "Fetch content from a URL. Returns the text content of the page."
@@ -3429,18 +3722,10 @@ class WebFetchTool(Tool):
             return f"Error fetching URL: {e}"
 
     def _html_to_text(self, html):
-        """Simple HTML tag removal."""
-        # Remove script and style
-        html = re.sub(r"<script[^>]*>.*?</script>", "", html, flags=re.DOTALL)
-        html = re.sub(r"<style[^>]*>.*?</style>", "", html, flags=re.DOTALL)
-        # Remove tags
-        html = re.sub(r"<[^>]+>", " ", html)
-        # Decode entities
-        html = html_module.unescape(html)
-        # Collapse whitespace
-        html = re.sub(r"\s+", " ", html)
-        html = re.sub(r"\n\s*\n+", "\n\n", html)
-        return html.strip()
+        """Simple HTML tag removal (memoized for pages up to 1MB)."""
+        if len(html) > _HTML_TEXT_CACHE_MAX:
+            return _html_to_text_impl(html)
+        return _html_to_text_cached(html)
 
 
 class WebSearchTool(Tool):
@@ -3463,6 +3748,24 @@ class WebSearchTool(Tool):
     _search_lock = threading.Lock()
     _MIN_INTERVAL = 2.0  # minimum seconds between searches
     _MAX_SEARCHES_PER_SESSION = 50
+    _conn_local = threading.local()  # keep-alive connection to DDG, per thread
+
+    def _urlopen(self, req, timeout):
+        """Fetch over a reused TLS connection; redirects go through urllib.
+
+        When a proxy is configured for the scheme (HTTP(S)_PROXY, not
+        bypassed by no_proxy) the request goes through urlopen, which
+        honors it; the raw keep-alive connection would not.
+        """
+        parsed = urllib.parse.urlsplit(req.full_url)
+        if (parsed.scheme in urllib.request.getproxies()
+                and not urllib.request.proxy_bypass(parsed.hostname or "")):
+            return urllib.request.urlopen(req, timeout=timeout)
+        resp = _keepalive_urlopen(self._conn_local, req, timeout)
+        if 300 <= resp.status < 400:
+            resp.close()
+            return urllib.request.urlopen(req, timeout=timeout)
+        return resp
 
     def execute(self, params):
         query = params.get("query", "")
@@ -3507,7 +3810,7 @@ class WebSearchTool(Tool):
             "Accept-Language": _accept_lang,
         })
         try:
-            resp = urllib.request.urlopen(req, timeout=30)
+            resp = self._urlopen(req, timeout=30)
             try:
                 html = resp.read(2 * 1024 * 1024).decode("utf-8", errors="replace")
             finally:
@@ -3691,19 +3994,8 @@ class NotebookEditTool(Tool):
 
         nb["cells"] = cells
         try:
-            # Atomic write: write to temp file, then rename
-            dirname = os.path.dirname(nb_path)
-            fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix=".ipynb.tmp")
-            try:
-                with os.fdopen(fd, "w", encoding="utf-8") as f:
-                    json.dump(nb, f, ensure_ascii=False, indent=1)
-                os.replace(tmp_path, nb_path)
-            except Exception:
-                try:
-                    os.unlink(tmp_path)
-                except OSError:
-                    pass
-                raise
+            _atomic_write_text(nb_path, json.dumps(nb, ensure_ascii=False, indent=1),
+                               suffix=".ipynb.tmp")
             return f"Notebook {edit_mode}d cell {cell_num} in {nb_path}"
         except Exception as e:
             return f"Error writing notebook: {e}"
@@ -4929,20 +5221,27 @@ class ToolRegistry:
 
     def __init__(self):
         self._tools = {}
+        self._cached_schemas = None
+        self._cached_names = None
 
     def register(self, tool):
         self._tools[tool.name] = tool
-        self._cached_schemas = None  # invalidate cache on new registration
+        # invalidate caches on new registration
+        self._cached_schemas = None
+        self._cached_names = None
 
     def get(self, name):
         return self._tools.get(name)
 
     def names(self):
-        return list(self._tools.keys())
+        """Registered tool names in registration order (cached, immutable)."""
+        if self._cached_names is None:
+            self._cached_names = tuple(self._tools)
+        return self._cached_names
 
     def get_schemas(self):
         """Return list of OpenAI function calling schemas (cached after first call)."""
-        if not hasattr(self, '_cached_schemas') or self._cached_schemas is None:
+        if self._cached_schemas is None:
             self._cached_schemas = [t.get_schema() for t in self._tools.values()]
         return self._cached_schemas
 
@@ -4963,10 +5262,10 @@ class ToolRegistry:
 class PermissionMgr:
     """Manages tool execution permissions."""
 
-    SAFE_TOOLS = {"Read", "Glob", "Grep", "SubAgent", "AskUserQuestion",
-                   "TaskCreate", "TaskList", "TaskGet", "TaskUpdate"}
-    ASK_TOOLS = {"Bash", "Write", "Edit", "NotebookEdit"}
-    NETWORK_TOOLS = {"WebFetch", "WebSearch"}
+    SAFE_TOOLS = frozenset({"Read", "Glob", "Grep", "SubAgent", "AskUserQuestion",
+                            "TaskCreate", "TaskList", "TaskGet", "TaskUpdate"})
+    ASK_TOOLS = {"Bash", "Write", "Edit", "NotebookEdit"}  # MCP tools are added at startup
+    NETWORK_TOOLS = frozenset({"WebFetch", "WebSearch"})
 
     def __init__(self, config):
         self.yes_mode = config.yes_mode
@@ -4982,6 +5281,8 @@ class PermissionMgr:
         r'\bmkfs\b',             # format filesystem
         r'\bdd\b.*\bof=/dev/',   # dd to device
     ]
+    # Single precompiled alternation: one regex scan per Bash command
+    _ALWAYS_CONFIRM_RE = re.compile("|".join(_ALWAYS_CONFIRM_PATTERNS), re.IGNORECASE)
 
     def _load_rules(self, path):
         if not os.path.isfile(path):
@@ -5014,20 +5315,19 @@ class PermissionMgr:
         # Even in -y mode, confirm truly dangerous Bash commands
         if tool_name == "Bash" and self.yes_mode:
             cmd = params.get("command", "")
-            for pat in self._ALWAYS_CONFIRM_PATTERNS:
-                if re.search(pat, cmd, re.IGNORECASE):
-                    if tui:
-                        result = tui.ask_permission(tool_name, params)
-                        if result == "yes_mode":
-                            self.yes_mode = True
-                            return True
-                        if result == "allow_all":
-                            return True
-                        if result == "deny_all":
-                            self._session_denies.add(tool_name)
-                            return False
-                        return result
-                    return False
+            if self._ALWAYS_CONFIRM_RE.search(cmd):
+                if tui:
+                    result = tui.ask_permission(tool_name, params)
+                    if result == "yes_mode":
+                        self.yes_mode = True
+                        return True
+                    if result == "allow_all":
+                        return True
+                    if result == "deny_all":
+                        self._session_denies.add(tool_name)
+                        return False
+                    return result
+                return False
         if self.yes_mode:
             return True
         if tool_name in self.SAFE_TOOLS:
@@ -5045,7 +5345,7 @@ class PermissionMgr:
             return True
 
         # Unknown tools denied without TUI
-        if tool_name not in self.SAFE_TOOLS and tool_name not in self.ASK_TOOLS and tool_name not in getattr(self, 'NETWORK_TOOLS', set()):
+        if tool_name not in self.ASK_TOOLS and tool_name not in self.NETWORK_TOOLS:
             if not tui:
                 return False  # Unknown tools denied without TUI
 
@@ -5085,19 +5385,137 @@ def _try_parse_json_value(value):
     return value
 
 
+# Patterns used by _extract_tool_calls_from_text, compiled once at import.
+# Neither body class can match a backtick, so each attempt is a single
+# forward scan that stops at the next backtick: the stdlib matcher cannot
+# backtrack into it, which is what an atomic group or possessive quantifier
+# would enforce. Code blocks also use a length cap as a further bound.
+_TC_CODE_BLOCK_RE = re.compile(r'```[^`]{0,50000}```', re.DOTALL)
+_TC_INLINE_CODE_RE = re.compile(r'`[^`]+`')
+# Applied in this order (one pass per tag, as the cleanup always has); each
+# pass is skipped when its tag name does not occur in the text at all
+_TC_WRAPPER_TAG_RES = tuple(
+    (tag, re.compile(r"</?%s[^>]*>" % re.escape(tag)))
+    for tag in ("function_calls", "action", "tool_call"))
+
+
+# The tag scanners below walk the text with str.find and yield
+# (full_match, name, body) exactly as the equivalent non-greedy DOTALL regex
+# finditer would.  Once a closing tag is missing past some offset it is
+# missing for every later candidate too, so each scanner stops there instead
+# of rescanning the tail for every unclosed opener (the regex worst case).
+
+def _scan_named_tags(text, tag):
+    """Scan <tag\\s+name="N">body</tag> (invoke / parameter)."""
+    opener, close = "<" + tag, "</%s>" % tag
+    n = len(text)
+    pos = 0
+    while True:
+        i = text.find(opener, pos)
+        if i < 0:
+            return
+        pos = i + 1
+        k = i + len(opener)
+        j = k
+        while j < n and text[j].isspace():
+            j += 1
+        if j == k or not text.startswith('name="', j):
+            continue
+        q = text.find('"', j + 6)
+        if q <= j + 6 or not text.startswith(">", q + 1):
+            continue
+        e = text.find(close, q + 2)
+        if e < 0:
+            return
+        yield text[i:e + len(close)], text[j + 6:q], text[q + 2:e]
+        pos = e + len(close)
+
+
+def _scan_eq_tags(text, tag):
+    """Scan Qwen-style <tag=N>body</tag> (function / parameter)."""
+    opener, close = "<%s=" % tag, "</%s>" % tag
+    pos = 0
+    while True:
+        i = text.find(opener, pos)
+        if i < 0:
+            return
+        k = i + len(opener)
+        g = text.find(">", k)
+        if g < 0:
+            return
+        if g == k:
+            pos = i + 1
+            continue
+        e = text.find(close, g + 1)
+        if e < 0:
+            return
+        yield text[i:e + len(close)], text[k:g], text[g + 1:e]
+        pos = e + len(close)
+
+
+def _scan_plain_tags(text, names=None):
+    """Scan <N>body</N> where N is in *names*, or any [a-zA-Z_]\\w* if None."""
+    unclosed = set()
+    pos = 0
+    while True:
+        i = text.find("<", pos)
+        if i < 0:
+            return
+        pos = i + 1
+        g = text.find(">", pos)
+        if g < 0:
+            return
+        name = text[pos:g]
+        if names is not None:
+            if name not in names:
+                continue
+        elif not (name and name[0].isascii() and (name[0].isalpha() or name[0] == "_")
+                  and (len(name) == 1 or name[1:].replace("_", "a").isalnum())):
+            continue
+        if name in unclosed:
+            continue
+        close = "</%s>" % name
+        e = text.find(close, g + 1)
+        if e < 0:
+            unclosed.add(name)
+            continue
+        yield text[i:e + len(close)], name, text[g + 1:e]
+        pos = e + len(close)
+
+
 def _extract_tool_calls_from_text(text, known_tools=None):
     """Parse XML-style tool calls from text content.
     Qwen models sometimes emit XML instead of using function calling.
     Returns (tool_calls_list, cleaned_text)."""
     tool_calls = []
     remaining_text = text
+    if known_tools:
+        known_tools = frozenset(known_tools)  # O(1) membership for every candidate
+    # Calls matched by more than one pattern are deduplicated as they are found.
+    # Keys use sort_keys so different key orderings are treated as equal.
+    seen = set()
+
+    def _add_call(tool_name, params):
+        key = (tool_name, json.dumps(params, sort_keys=True))
+        if key in seen:
+            return
+        seen.add(key)
+        tool_calls.append({
+            # Issue #2: use full uuid4 hex (32 chars) to avoid collision
+            "id": f"call_{uuid.uuid4().hex}",
+            "type": "function",
+            "function": {
+                "name": tool_name,
+                "arguments": json.dumps(params, ensure_ascii=False),
+            },
+        })
 
     # Strip code blocks to avoid extracting tool calls from examples
     # Use non-greedy with length cap to prevent ReDoS on malformed input
-    stripped = re.sub(r'```[^`]{0,50000}```', '', text, flags=re.DOTALL)
+    stripped = _TC_CODE_BLOCK_RE.sub('', text)
     # Also strip inline backtick code to prevent prompt injection via file content
     # (Issue #5: verified — both code-block and inline-code stripping are working)
-    stripped = re.sub(r'`[^`]+`', '', stripped)
+    stripped = _TC_INLINE_CODE_RE.sub('', stripped)
     search_text = stripped
 
     # Issue #4 (ReDoS protection): Quick bail-out — if no XML-like closing tags
@@ -5106,130 +5524,115 @@ def _extract_tool_calls_from_text(text, known_tools=None):
         return [], text.strip()
 
     # Pattern 1: <invoke name="ToolName"><parameter name="p">v</parameter></invoke>
-    invoke_pat = re.compile(
-        r'<invoke\s+name=\"([^\"]+)\">(.*?)</invoke>', re.DOTALL)
-    param_pat = re.compile(
-        r'<parameter\s+name=\"([^\"]+)\">(.*?)</parameter>', re.DOTALL)
-
-    for m in invoke_pat.finditer(search_text):
+    for match, name, params_text in _scan_named_tags(search_text, "invoke"):
         # Issue #3: strip whitespace from tool names
-        tool_name = m.group(1).strip()
+        tool_name = name.strip()
         # Early filter: skip tool names not in known set (defense-in-depth)
         if known_tools and tool_name not in known_tools:
             continue
-        params_text = m.group(2)
         params = {}
-        for pm in param_pat.finditer(params_text):
+        for _, pname, pval in _scan_named_tags(params_text, "parameter"):
             # Issue #1: decode XML entities in parameter values
-            raw_val = html_module.unescape(pm.group(2).strip())
+            raw_val = html_module.unescape(pval.strip())
             # Issue #9: auto-parse JSON values
-            params[pm.group(1).strip()] = _try_parse_json_value(raw_val)
-        tool_calls.append({
-            # Issue #2: use full uuid4 hex (32 chars) to avoid collision
-            "id": f"call_{uuid.uuid4().hex}",
-            "type": "function",
-            "function": {
-                "name": tool_name,
-                "arguments": json.dumps(params, ensure_ascii=False),
-            },
-        })
-        # Issue #6: We use m.group(0) which was matched against search_text
+            params[pname.strip()] = _try_parse_json_value(raw_val)
+        _add_call(tool_name, params)
+        # Issue #6: We use the match text which was matched against search_text
         # (code-block-stripped version). This is intentional — we want to remove
         # ALL instances of that exact XML string from the original text, even if
         # the positions differ between search_text and remaining_text.
-        remaining_text = remaining_text.replace(m.group(0), "")
+        remaining_text = remaining_text.replace(match, "")
 
     # Pattern 2: Qwen format: <function=ToolName><parameter=param>value</parameter></function>
-    qwen_func_pat = re.compile(r'<function=([^>]+)>(.*?)</function>', re.DOTALL)
-    qwen_param_pat = re.compile(r'<parameter=([^>]+)>(.*?)</parameter>', re.DOTALL)
-
-    for m in qwen_func_pat.finditer(search_text):
+    for match, name, params_text in _scan_eq_tags(search_text, "function"):
         # Issue #3: strip whitespace from tool names
-        tool_name = m.group(1).strip()
+        tool_name = name.strip()
         # Early filter: skip tool names not in known set (defense-in-depth)
         if known_tools and tool_name not in known_tools:
             continue
-        params_text = m.group(2)
         params = {}
-        for pm in qwen_param_pat.finditer(params_text):
+        for _, pname, pval in _scan_eq_tags(params_text, "parameter"):
             # Issue #1: decode XML entities in parameter values
-            raw_val = html_module.unescape(pm.group(2).strip())
+            raw_val = html_module.unescape(pval.strip())
             # Issue #9: auto-parse JSON values
-            params[pm.group(1).strip()] = _try_parse_json_value(raw_val)
+            params[pname.strip()] = _try_parse_json_value(raw_val)
         if params:
-            tool_calls.append({
-                # Issue #2: use full uuid4 hex (32 chars)
-                "id": f"call_{uuid.uuid4().hex}",
-                "type": "function",
-                "function": {
-                    "name": tool_name,
-                    "arguments": json.dumps(params, ensure_ascii=False),
-                },
-            })
-            remaining_text = remaining_text.replace(m.group(0), "")
+            _add_call(tool_name, params)
+            remaining_text = remaining_text.replace(match, "")
 
     # Pattern 3: <ToolName><param>val</param></ToolName>
     # (Issue #7: All 3 patterns run without early returns; dedup handles overlaps.)
     if known_tools:
-        names_re = "|".join(re.escape(t) for t in known_tools)
-        simple_pat = re.compile(r"<(%s)>(.*?)</\1>" % names_re, re.DOTALL)
-        inner_pat = re.compile(r"<([a-zA-Z_]\w*)>(.*?)</\1>", re.DOTALL)
-        for m in simple_pat.finditer(search_text):
+        for match, name, inner in _scan_plain_tags(search_text, known_tools):
             # Issue #3: strip whitespace from tool names
-            tool_name = m.group(1).strip()
-            inner = m.group(2)
+            tool_name = name.strip()
             params = {}
-            for pm in inner_pat.finditer(inner):
+            for _, pname, pval in _scan_plain_tags(inner):
                 # Issue #1: decode XML entities in parameter values
-                raw_val = html_module.unescape(pm.group(2).strip())
+                raw_val = html_module.unescape(pval.strip())
                 # Issue #9: auto-parse JSON values
-                params[pm.group(1).strip()] = _try_parse_json_value(raw_val)
+                params[pname.strip()] = _try_parse_json_value(raw_val)
             if params:
-                tool_calls.append({
-                    # Issue #2: use full uuid4 hex (32 chars)
-                    "id": f"call_{uuid.uuid4().hex}",
-                    "type": "function",
-                    "function": {
-                        "name": tool_name,
-                        "arguments": json.dumps(params, ensure_ascii=False),
-                    },
-                })
-                remaining_text = remaining_text.replace(m.group(0), "")
+                _add_call(tool_name, params)
+                remaining_text = remaining_text.replace(match, "")
 
     # Issue #8: Consolidate wrapper tag cleanup at the end after all patterns.
     # Clean function_calls, action, and tool_call wrapper tags in one place.
-    for tag in ["function_calls", "action", "tool_call"]:
-        remaining_text = re.sub(r"</?%s[^>]*>" % re.escape(tag), "", remaining_text)
+    for tag, tag_re in _TC_WRAPPER_TAG_RES:
+        if tag in remaining_text:
+            remaining_text = tag_re.sub("", remaining_text)
 
-    # Deduplicate tool calls that may have been matched by multiple patterns
-    # Normalize JSON arguments so different key orderings are treated as equal
-    seen = set()
-    deduped = []
-    for tc in tool_calls:
-        # Issue #10: If known_tools is provided, filter all patterns' results
-        # to only include tools in the known set.
-        if known_tools and tc["function"]["name"] not in known_tools:
-            continue
-        args_raw = tc["function"]["arguments"]
-        try:
-            norm_args = json.dumps(json.loads(args_raw), sort_keys=True)
-        except (json.JSONDecodeError, TypeError):
-            norm_args = args_raw
-        key = (tc["function"]["name"], norm_args)
-        if key not in seen:
-            seen.add(key)
-            deduped.append(tc)
-    return deduped, remaining_text.strip()
+    # Issue #10: every pattern only accepts names from known_tools when it is
+    # given (patterns 1/2 skip others, pattern 3 scans for known names only).
+    return tool_calls, remaining_text.strip()
 
 
 # ════════════════════════════════════════════════════════════════════════════════
 # Session — Conversation history management
 # ════════════════════════════════════════════════════════════════════════════════
 
+# orjson turns integers wider than 64 bits into floats; lines with long digit
+# runs go straight to json so results never depend on orjson being installed.
+_LONG_DIGITS_RE = re.compile(r'\d{19}')
+
+
+def _json_loads_line(line):
+    """json.loads for one JSONL record, using orjson's C parser when available.
+
+    Lines orjson rejects (NaN/Infinity) are retried with json.loads, so
+    genuinely corrupt lines still raise json.JSONDecodeError.
+    """
+    if HAS_ORJSON and not _LONG_DIGITS_RE.search(line):
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(line)
+
+
+def _json_dumps_line(msg):
+    """Encode one JSONL record (UTF-8 bytes, trailing newline included).
+
+    Messages orjson cannot encode (ints wider than 64 bits, odd key types)
+    fall back to json.dumps.
+    """
+    if HAS_ORJSON:
+        try:
+            return orjson.dumps(msg, option=orjson.OPT_APPEND_NEWLINE)
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    return (json.dumps(msg, ensure_ascii=False) + "\n").encode("utf-8")
+
+
 class Session:
     """Manages conversation history with optional persistence and compaction."""
 
     MAX_MESSAGES = 500  # hard limit to prevent unbounded memory growth
+    # ASCII bytes stripped from session IDs (everything but [A-Za-z0-9_-]);
+    # non-ASCII is dropped by the encode step before translate.
+    _SID_DELETE_BYTES = bytes(
+        c for c in range(128)
+        if not (chr(c).isalnum() or chr(c) in "_-"))
 
     def __init__(self, config, system_prompt):
         self.config = config
@@ -5240,12 +5643,36 @@ class Session:
             datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:6]
         )
         # Sanitize session ID to prevent path traversal
-        self.session_id = re.sub(r'[^A-Za-z0-9_\-]', '', raw_id)[:64]
+        self.session_id = raw_id.encode("ascii", "ignore").translate(
+            None, self._SID_DELETE_BYTES).decode("ascii")[:64]
         if not self.session_id:
             self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:6]
         self._token_estimate = 0
         self._last_compact_msg_count = 0  # prevent infinite re-compaction
         self._just_compacted = False  # skip token reconciliation right after compaction
+        self._sessions_root = None  # (sessions_dir, its realpath), see _safe_session_path
+
+    def _safe_session_path(self, session_id):
+        """Return the .jsonl path for session_id, or None if it escapes sessions_dir.
+
+        The candidate is canonicalized once with realpath, which covers "..",
+        absolute ids and symlinked components alike. The realpath of
+        sessions_dir itself is cached per directory string.
+        """
+        sessions_dir = self.config.sessions_dir
+        root = self._sessions_root
+        if root is None or root[0] != sessions_dir:
+            root = self._sessions_root = (sessions_dir, os.path.realpath(sessions_dir))
+        real_dir = root[1]
+        path = os.path.join(sessions_dir, f"{session_id}.jsonl")
+        real_path = os.path.realpath(path)
+        try:
+            inside = os.path.commonpath([real_path, real_dir]) == real_dir
+        except ValueError:  # different drives on Windows
+            return None
+        if not inside or real_path == real_dir:
+            return None
+        return path
 
     def set_client(self, client):
         """Set OllamaClient reference for sidecar model summarization."""
@@ -5302,18 +5729,26 @@ class Session:
         index = Session._load_project_index(config)
         return index.get(cwd_key)
 
+    # Runs of characters counted as ~1 token each by _estimate_tokens
+    _CJK_RUN_RE = re.compile(
+        '[\u3000-\u303f'   # CJK symbols/punctuation
+        '\u3040-\u30ff'    # hiragana/katakana
+        '\u31f0-\u31ff'    # katakana ext
+        '\u3400-\u4dbf'    # CJK ext-A
+        '\u4e00-\u9fff'    # CJK unified
+        '\uac00-\ud7af'    # korean
+        '\uff01-\uff60]+'  # fullwidth forms
+    )
+
     @staticmethod
     def _estimate_tokens(text):
         """Estimate tokens with better CJK support. CJK chars ≈ 1 token each."""
         if not text:
             return 0
-        cjk_count = sum(1 for ch in text if '\u4e00' <= ch <= '\u9fff'
-                        or '\u3400' <= ch <= '\u4dbf'   # CJK ext-A
-                        or '\u3040' <= ch <= '\u30ff'   # hiragana/katakana
-                        or '\u3000' <= ch <= '\u303f'   # CJK symbols/punctuation
-                        or '\u31f0' <= ch <= '\u31ff'   # katakana ext
-                        or '\uff01' <= ch <= '\uff60'   # fullwidth forms
-                        or '\uac00' <= ch <= '\ud7af')  # korean
+        if text.isascii():  # common case (code, logs): no per-char scan at all
+            return len(text) // 4
+        # Match whole runs so the scan and the counting both stay in C
+        cjk_count = sum(map(len, Session._CJK_RUN_RE.findall(text)))
         non_cjk = len(text) - cjk_count
         return cjk_count + non_cjk // 4
 
@@ -5328,36 +5763,37 @@ class Session:
         if cut >= len(self.messages):
             # All remaining messages are tool results — keep at least some messages
             cut = len(self.messages) - self.MAX_MESSAGES
+        # Ensure the kept list doesn't start with orphaned tool results (O(n) slice instead of O(n^2) pop)
+        while cut < len(self.messages) - 1 and self.messages[cut].get("role") == "tool":
+            cut += 1
+        # Runs on every append once the cap is reached: subtract just the
+        # dropped messages rather than re-estimating the whole history
+        dropped = sum(map(self._message_tokens, self.messages[:cut]))
+        self._token_estimate = max(0, self._token_estimate - dropped)
         self.messages = self.messages[cut:]
-        # Ensure the message list doesn't start with orphaned tool results (O(n) slice instead of O(n^2) pop)
-        skip = 0
-        while skip < len(self.messages) - 1 and self.messages[skip].get("role") == "tool":
-            skip += 1
-        if skip > 0:
-            self.messages = self.messages[skip:]
-        # Guard: never erase all history
-        if not self.messages:
-            self.messages = [{"role": "user", "content": "(history trimmed)"}]
-        self._recalculate_tokens()
+
+    @staticmethod
+    def _message_tokens(m):
+        """Estimated token cost of one history message."""
+        total = 0
+        content = m.get("content")
+        if isinstance(content, list):
+            # Multipart content (e.g. image messages): sum text parts + estimate images
+            for part in content:
+                if isinstance(part, dict):
+                    if part.get("type") == "text":
+                        total += Session._estimate_tokens(part.get("text", ""))
+                    elif part.get("type") == "image_url":
+                        total += 800  # approximate token cost for an image
+        else:
+            total += Session._estimate_tokens(content or "")
+        if m.get("tool_calls"):
+            total += len(json.dumps(m["tool_calls"], ensure_ascii=False)) // 4
+        return total
 
     def _recalculate_tokens(self):
         """Recalculate token estimate from current messages."""
-        total = 0
-        for m in self.messages:
-            content = m.get("content")
-            if isinstance(content, list):
-                # Multipart content (e.g. image messages): sum text parts + estimate images
-                for part in content:
-                    if isinstance(part, dict):
-                        if part.get("type") == "text":
-                            total += self._estimate_tokens(part.get("text", ""))
-                        elif part.get("type") == "image_url":
-                            total += 800  # approximate token cost for an image
-            else:
-                total += self._estimate_tokens(content or "")
-            if m.get("tool_calls"):
-                total += len(json.dumps(m["tool_calls"], ensure_ascii=False)) // 4
-        self._token_estimate = total
+        self._token_estimate = sum(map(self._message_tokens, self.messages))
 
     def add_user_message(self, text):
         self.messages.append({"role": "user", "content": text})
@@ -5439,23 +5875,35 @@ class Session:
                 continue
 
             # Pre-truncate very large results (H19 fix)
-            if self._estimate_tokens(output) > max_result_tokens:
+            tokens = self._estimate_tokens(output)  # CJK output costs a full scan; do it once
+            if tokens > max_result_tokens:
                 cutoff = max_result_tokens * 3  # approximate char count
                 output = output[:cutoff] + "\n...(truncated: result too large)..."
+                tokens = self._estimate_tokens(output)
             self.messages.append({
                 "role": "tool",
                 "tool_call_id": r.id,
                 "content": output,
             })
-            self._token_estimate += self._estimate_tokens(output)
+            self._token_estimate += tokens
         self._enforce_max_messages()
 
     def get_messages(self):
         """Return full message list with system prompt prepended."""
         return [{"role": "system", "content": self.system_prompt}] + self.messages
 
+    @property
+    def system_prompt(self):
+        return self._system_prompt
+
+    @system_prompt.setter
+    def system_prompt(self, text):
+        # Estimated once here; get_token_estimate() runs on every turn
+        self._system_prompt = text
+        self._system_prompt_tokens = self._estimate_tokens(text)
+
     def get_token_estimate(self):
-        return self._token_estimate + self._estimate_tokens(self.system_prompt)
+        return self._token_estimate + self._system_prompt_tokens
 
     def _summarize_old_messages(self, old_messages):
         """Use sidecar model to generate a summary of old conversation messages.
@@ -5558,36 +6006,34 @@ class Session:
                 return
 
         # --- Fallback: drop old messages and keep recent ones ---
-        # Skip past orphaned tool results at cutoff boundary
-        actual_cutoff = cutoff
-        while actual_cutoff < len(self.messages) and self.messages[actual_cutoff].get("role") == "tool":
-            actual_cutoff += 1
-        self.messages = self.messages[actual_cutoff:]
-
+        # Find the final start index first and slice once. Both scans stop
+        # on a non-tool message, so no orphaned tool result leads the list.
+        messages = self.messages
+        n = len(messages)
+        start = cutoff
+        while start < n and messages[start].get("role") == "tool":
+            start += 1
         # Drop oldest messages if still exceeding hard limit
-        if len(self.messages) > self.MAX_MESSAGES:
-            cut_idx = len(self.messages) - self.MAX_MESSAGES
-            while cut_idx < len(self.messages) and self.messages[cut_idx].get("role") == "tool":
-                cut_idx += 1
-            self.messages = self.messages[cut_idx:]
-
-        # Final safety: ensure no orphaned tool results at start (slice instead of pop(0) loop)
-        skip = 0
-        while skip < len(self.messages) and self.messages[skip].get("role") == "tool":
-            skip += 1
-        if skip:
-            self.messages = self.messages[skip:]
+        if n - start > self.MAX_MESSAGES:
+            start = n - self.MAX_MESSAGES
+            while start < n and messages[start].get("role") == "tool":
+                start += 1
+        self.messages = messages[start:]
 
         self._recalculate_tokens()
 
-        # After compaction, if still over budget, truncate recent tool results
+        # After compaction, if still over budget, truncate recent tool results.
+        # Adjust the fresh estimate by each rewrite's delta instead of
+        # re-estimating the whole history a second time.
         if self._token_estimate > max_tokens:
             for i, msg in enumerate(self.messages):
                 if msg.get("role") == "tool":
                     content = msg.get("content", "")
                     if len(content) > 500:
-                        self.messages[i] = {**msg, "content": content[:200] + "\n...(truncated)...\n" + content[-200:]}
-            self._recalculate_tokens()
+                        short = content[:200] + "\n...(truncated)...\n" + content[-200:]
+                        self.messages[i] = {**msg, "content": short}
+                        self._token_estimate += (self._estimate_tokens(short)
+                                                 - self._estimate_tokens(content))
 
         self._just_compacted = True
 
@@ -5595,27 +6041,28 @@ class Session:
         """Save session to JSONL file and update project index."""
         if not self.messages:
             return  # nothing to persist; don't create empty files
-        path = os.path.join(self.config.sessions_dir, f"{self.session_id}.jsonl")
-        # Verify resolved path stays inside sessions_dir (path traversal guard)
-        real_path = os.path.realpath(path)
-        real_dir = os.path.realpath(self.config.sessions_dir)
-        if not real_path.startswith(real_dir + os.sep):
+        path = self._safe_session_path(self.session_id)
+        if path is None:  # path traversal guard
             print(f"{C.RED}Warning: session path escapes sessions directory — refusing to write.{C.RESET}",
                   file=sys.stderr)
             return
-        # Guard against symlink attacks on session file
+        # Refuse to replace a symlink planted at the session path. A link
+        # swapped in after this check is harmless: os.replace() renames over
+        # the link itself and never writes through it.
         if os.path.islink(path):
             print(f"{C.RED}Warning: session file is a symlink — refusing to write for safety.{C.RESET}",
                   file=sys.stderr)
             return
         try:
             sessions_dir = os.path.dirname(path)
+            # mkstemp opens with O_CREAT|O_EXCL|O_NOFOLLOW and mode 0600, so
+            # the temp file is private from the start
             fd, tmp_path = tempfile.mkstemp(dir=sessions_dir, suffix=".jsonl.tmp")
             try:
-                with os.fdopen(fd, "w", encoding="utf-8") as f:
-                    for msg in self.messages:
-                        f.write(json.dumps(msg, ensure_ascii=False) + "\n")
-                os.chmod(tmp_path, 0o600)  # restrict permissions before exposing
+                # Encode everything first, then hand the file a single write
+                payload = b"".join(_json_dumps_line(msg) for msg in self.messages)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(payload)
                 os.replace(tmp_path, path)  # atomic rename
             except Exception:
                 try:
@@ -5642,37 +6089,48 @@ class Session:
     def load(self, session_id=None):
         """Load session from JSONL file."""
         sid = session_id or self.session_id
-        path = os.path.join(self.config.sessions_dir, f"{sid}.jsonl")
-        # Verify resolved path stays inside sessions_dir (path traversal guard)
-        real_path = os.path.realpath(path)
-        real_dir = os.path.realpath(self.config.sessions_dir)
-        if not real_path.startswith(real_dir + os.sep):
+        path = self._safe_session_path(sid)
+        if path is None:  # path traversal guard
             return False
-        if not os.path.isfile(path):
+        # Open without following symlinks and vet the opened file itself, so
+        # the path cannot be swapped for a link between check and read.
+        # O_NONBLOCK keeps a planted FIFO from blocking the open.
+        nofollow = getattr(os, "O_NOFOLLOW", 0)
+        symlink_msg = f"{C.RED}Warning: session file is a symlink — refusing to read for safety.{C.RESET}"
+        if not nofollow and os.path.islink(path):  # e.g. Windows: no O_NOFOLLOW
+            print(symlink_msg, file=sys.stderr)
             return False
-        # Reject oversized session files to prevent memory exhaustion
         try:
-            if os.path.getsize(path) > self.MAX_SESSION_FILE_SIZE:
-                print(f"{C.RED}Session file too large (>{self.MAX_SESSION_FILE_SIZE // (1024*1024)}MB). "
-                      f"Delete or truncate: {path}{C.RESET}", file=sys.stderr)
-                return False
+            fd = os.open(path, os.O_RDONLY | nofollow | getattr(os, "O_NONBLOCK", 0))
         except OSError:
-            pass
-        # Reject symlinked session files
-        if os.path.islink(path):
-            print(f"{C.RED}Warning: session file is a symlink — refusing to read for safety.{C.RESET}",
-                  file=sys.stderr)
+            if os.path.islink(path):
+                print(symlink_msg, file=sys.stderr)
+            return False
+        try:
+            st = os.fstat(fd)
+        except OSError:
+            os.close(fd)
+            return False
+        if not stat.S_ISREG(st.st_mode):
+            os.close(fd)
+            return False
+        # Reject oversized session files to prevent memory exhaustion
+        if st.st_size > self.MAX_SESSION_FILE_SIZE:
+            os.close(fd)
+            print(f"{C.RED}Session file too large (>{self.MAX_SESSION_FILE_SIZE // (1024*1024)}MB). "
+                  f"Delete or truncate: {path}{C.RESET}", file=sys.stderr)
             return False
         try:
             self.messages = []
             skipped = 0
-            with open(path, encoding="utf-8") as f:
+            # Stream line by line: only one record is held in memory at a time
+            with open(fd, encoding="utf-8", buffering=1 << 20) as f:
                 for line_num, line in enumerate(f, 1):
                     line = line.strip()
                     if not line:
                         continue
                     try:
-                        msg = json.loads(line)
+                        msg = _json_loads_line(line)
                         # Basic schema validation
                         if isinstance(msg, dict) and "role" in msg:
                             self.messages.append(msg)
@@ -5702,23 +6160,33 @@ class Session:
         sessions_dir = config.sessions_dir
         if not os.path.isdir(sessions_dir):
             return sessions
-        jsonl_files = [f for f in os.listdir(sessions_dir) if f.endswith(".jsonl")]
-        for f in sorted(jsonl_files, reverse=True)[:50]:
-                sid = f[:-6]
-                path = os.path.join(sessions_dir, f)
-                try:
-                    mtime = os.path.getmtime(path)
-                    size = os.path.getsize(path)
-                except OSError:
-                    continue  # file may have been deleted between listdir and stat
-                # Estimate message count from file size instead of reading the whole file
-                messages_est = max(1, size // 200)  # rough estimate: ~200 bytes per message
-                sessions.append({
-                    "id": sid,
-                    "modified": time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime)),
-                    "size": size,
-                    "messages": messages_est,
-                })
+        # One lstat per entry; symlinks are skipped (load() refuses them anyway)
+        jsonl_files = []
+        try:
+            with os.scandir(sessions_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(".jsonl"):
+                        continue
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue  # file may have been deleted during the scan
+                    jsonl_files.append((st.st_mtime_ns, entry.name, st))
+        except OSError:
+            return sessions
+        # Most recently modified first, top 50 without sorting the whole dir
+        for _mtime_ns, f, st in heapq.nlargest(50, jsonl_files, key=lambda c: c[:2]):
+            sid = f[:-6]
+            # Estimate message count from file size instead of reading the whole file
+            messages_est = max(1, st.st_size // 200)  # rough estimate: ~200 bytes per message
+            sessions.append({
+                "id": sid,
+                "modified": time.strftime("%Y-%m-%d %H:%M", time.localtime(st.st_mtime)),
+                "size": st.st_size,
+                "messages": messages_est,
+            })
         return sessions
 
 
@@ -6205,40 +6673,51 @@ class TUI:
 
         return content, tool_calls
 
+    _MD_INLINE_CODE_RE = re.compile(r'`([^`]+)`')
+    _MD_BOLD_RE = re.compile(r'\*\*([^*]+)\*\*')
+
     def _render_markdown(self, text):
-        """Simple markdown-ish rendering for terminal."""
-        _p = self._scroll_print
+        """Simple markdown-ish rendering for terminal.
+
+        Lines are rendered into a list and printed with a single call, so the
+        scroll-region lock and stdout flush happen once per message.
+        """
+        out = []
         in_code_block = False
-        lines = text.split("\n")
-        for i, line in enumerate(lines):
+        sep_w = min(40, _get_terminal_width() - 6)
+        code_sub = f'{C.GREEN}\\1{C.RESET}'
+        bold_sub = f'{C.BOLD}\\1{C.RESET}'
+        for line in text.split("\n"):
             if line.startswith("```"):
                 in_code_block = not in_code_block
                 if in_code_block:
                     lang = line[3:].strip()
-                    sep_w = min(40, _get_terminal_width() - 6)
-                    _p(f"\n{C.DIM}{'─' * sep_w} {lang}{C.RESET}")
+                    out.append(f"\n{C.DIM}{'─' * sep_w} {lang}{C.RESET}")
                 else:
-                    sep_w = min(40, _get_terminal_width() - 6)
-                    _p(f"{C.DIM}{'─' * sep_w}{C.RESET}")
+                    out.append(f"{C.DIM}{'─' * sep_w}{C.RESET}")
                 continue
 
             if in_code_block:
-                _p(f"{C.GREEN}{line}{C.RESET}")
+                out.append(f"{C.GREEN}{line}{C.RESET}")
                 continue
 
             # Headers
             if line.startswith("### "):
-                _p(f"{C.BOLD}{C.CYAN}{line[4:]}{C.RESET}")
+                out.append(f"{C.BOLD}{C.CYAN}{line[4:]}{C.RESET}")
             elif line.startswith("## "):
-                _p(f"{C.BOLD}{C.BCYAN}{line[3:]}{C.RESET}")
+                out.append(f"{C.BOLD}{C.BCYAN}{line[3:]}{C.RESET}")
             elif line.startswith("# "):
-                _p(f"{C.BOLD}{C.BMAGENTA}{line[2:]}{C.RESET}")
+                out.append(f"{C.BOLD}{C.BMAGENTA}{line[2:]}{C.RESET}")
             else:
+                rendered = line
                 # Inline code
-                rendered = re.sub(r'`([^`]+)`', f'{C.GREEN}\\1{C.RESET}', line)
+                if "`" in rendered:
+                    rendered = self._MD_INLINE_CODE_RE.sub(code_sub, rendered)
                 # Bold
-                rendered = re.sub(r'\*\*([^*]+)\*\*', f'{C.BOLD}\\1{C.RESET}', rendered)
-                _p(rendered)
+                if "**" in rendered:
+                    rendered = self._MD_BOLD_RE.sub(bold_sub, rendered)
+                out.append(rendered)
+        self._scroll_print("\n".join(out))
 
     # Tool icons with neon color
     @staticmethod
@@ -6687,6 +7166,45 @@ class Agent:
         self.git_checkpoint = GitCheckpoint(config.cwd)
         self.auto_test = AutoTestRunner(config.cwd)
         self.file_watcher = FileWatcher(config.cwd)
+        self._tool_pool = None            # created on first parallel batch
+
+    def _get_tool_pool(self):
+        """Return the worker pool for parallel read-only tools, creating it once."""
+        if self._tool_pool is None:
+            self._tool_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=4, thread_name_prefix="vc-tool")
+        return self._tool_pool
+
+    def _run_parallel_batch(self, exec_one, items):
+        """Run exec_one over items on the shared pool and wait for all of them.
+
+        Returns {tc_id: (future, item)}. If the wait is interrupted (Ctrl+C),
+        queued calls are cancelled, and a pool still busy with running calls
+        is retired so they cannot hold workers the next batch needs.
+        """
+        futures_map = {}
+        pool = self._get_tool_pool()
+        try:
+            for item in items:
+                futures_map[item[0]] = (pool.submit(exec_one, item), item)
+            concurrent.futures.wait([f for f, _ in futures_map.values()])
+        finally:
+            pending = [f for f, _ in futures_map.values() if not f.done()]
+            for future in pending:
+                future.cancel()
+            if any(not f.done() for f in pending):
+                self.close()
+        return futures_map
+
+    def close(self):
+        """Release the tool worker pool (idle threads would otherwise linger)."""
+        pool, self._tool_pool = self._tool_pool, None
+        if pool is not None:
+            try:
+                pool.shutdown(wait=False, cancel_futures=True)
+            except TypeError:
+                # Python 3.8: cancel_futures not available
+                pool.shutdown(wait=False)
 
     @staticmethod
     def _detect_parallel_tasks(user_input):
@@ -6989,20 +7507,7 @@ class Agent:
                             return ToolResult(tc_id, error_msg, True)
 
                     # Execute all in parallel, buffer results, display in original order
-                    futures_map = {}
-                    pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
-                    try:
-                        for item in validated_calls:
-                            future = pool.submit(_exec_one, item)
-                            futures_map[item[0]] = (future, item)
-                        concurrent.futures.wait([f for f, _ in futures_map.values()])
-                    finally:
-                        # cancel_futures (Python 3.9+) prevents blocking on outstanding work during Ctrl+C
-                        try:
-                            pool.shutdown(wait=False, cancel_futures=True)
-                        except TypeError:
-                            # Python 3.8: cancel_futures not available
-                            pool.shutdown(wait=False)
+                    futures_map = self._run_parallel_batch(_exec_one, validated_calls)
 
                     # Show results in the original order of tool_calls
                     for tc_id, tool_name, tool_params, tool in validated_calls:
@@ -8179,11 +8684,12 @@ def main():
             readline.write_history_file(config.history_file)
         except Exception:
             pass
-    # Cleanup file watcher
+    # Cleanup file watcher and tool workers
     try:
         agent.file_watcher.stop()
     except Exception:
         pass
+    agent.close()
     # Cleanup MCP server subprocesses
     for mcp in _mcp_clients:
         try: